@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Reading contributed CSV files
+
+ Files come from many labs: separated by commas, semicolons, tabs or bars,
+ with decimal points or decimal commas, in UTF-8 (with or without a byte
+ order mark), UTF-16 or Windows-1252. sniff_csv samples the start of a file
+ to work out its dialect, and read_csv parses it with that dialect.
+
+ read_csv parses with pyarrow's multithreaded CSV reader when pyarrow is
+ installed and the options allow it (it can't read row counts or chunks),
+ converting straight into the requested dtypes. Otherwise, or when pyarrow
+ fails on a file, it falls back to pandas' own parser, set up to give the
+ same dataframe (numbers are rounded the same way by both).
+
+ Usage:
+    dialect = sniff_csv(datafile)    # {'encoding': 'utf-8', 'delimiter': ';', 'decimal': ','}
+    dataframe = read_csv(datafile, dtype={'Subj_idx': 'Int64'})
+    columns = read_header(datafile)
+
+--------------------------------------------------------------------------
+"""
+
+import codecs
+import csv
+import importlib.util
+import re
+
+# Bytes read from the start of a file to work out its dialect
+sample_bytes = 64 * 1024
+
+# Lines of the sample compared when choosing the delimiter
+sample_lines = 100
+
+# Delimiters tried, in order of preference when several fit
+candidate_delimiters = [',', ';', '\t', '|']
+
+# Encodings tried in turn on files without a byte order mark (latin-1 reads any bytes, so it comes last)
+candidate_encodings = ['utf-8', 'cp1252', 'latin-1']
+
+# Parse with pyarrow when it is installed (set to False to always use pandas' parser)
+use_arrow = importlib.util.find_spec('pyarrow') is not None
+
+# Cells pandas' parser reads as missing by default (see the na_values entry of the pandas.read_csv docs)
+default_na_values = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                     '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# A number written with a decimal comma, and one written with a decimal point
+decimal_comma_number = re.compile(r'^\s*-?\d+,\d+\s*$')
+decimal_point_number = re.compile(r'^\s*-?\d*\.\d+\s*$')
+
+
+def detect_encoding(sample):
+    """ Encoding of a file from the first bytes of it """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    for encoding in candidate_encodings:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample)  # A character cut off at the end of the sample is fine
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return candidate_encodings[-1]
+
+
+def sample_rows(lines, delimiter):
+    """ Fields of the sample lines, split with a delimiter """
+    return list(csv.reader(lines, delimiter=delimiter))
+
+
+def detect_delimiter(lines):
+    """
+    Delimiter splitting the header into the most fields, among those that split
+    most lines into as many fields as the header (',' if none does)
+    """
+    best, best_fields = ',', 1
+    for delimiter in candidate_delimiters:
+        rows = sample_rows(lines, delimiter)
+        if not rows:
+            break
+        fields = len(rows[0])
+        if fields > best_fields and 2 * sum(len(row) == fields for row in rows) > len(rows):
+            best, best_fields = delimiter, fields
+    return best
+
+
+def detect_decimal(lines, delimiter):
+    """ ',' if the numbers of the sample are written with decimal commas, '.' otherwise """
+    if delimiter == ',':
+        return '.'
+    values = [value for row in sample_rows(lines[1:], delimiter) for value in row]
+    if any(decimal_point_number.match(value) for value in values):
+        return '.'
+    return ',' if any(decimal_comma_number.match(value) for value in values) else '.'
+
+
+def sniff_csv(path):
+    """ Encoding, delimiter and decimal separator of a CSV file, from a sample of its first lines """
+    with open(path, 'rb') as file:
+        sample = file.read(sample_bytes)
+
+    encoding = detect_encoding(sample)
+    lines = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample).splitlines()
+    if len(sample) == sample_bytes:
+        lines = lines[:-1]  # The last line of a full sample may be cut off
+    lines = [line for line in lines[:sample_lines] if line.strip()]
+
+    delimiter = detect_delimiter(lines)
+    return {'encoding': encoding, 'delimiter': delimiter, 'decimal': detect_decimal(lines, delimiter)}
+
+
+def read_header(path, dialect=None):
+    """ Column names from the first line of a CSV file, without loading pandas """
+    dialect = dialect or sniff_csv(path)
+    with open(path, newline='', encoding=dialect['encoding'], errors='replace') as file:
+        return next(csv.reader(file, delimiter=dialect['delimiter']), [])
+
+
+def arrow_table(path, dialect, dtype, na_values, usecols):
+    """ pyarrow table of a CSV file, with the columns that become categorical kept as text """
+    import pyarrow as pa
+    from pyarrow import csv as arrow_csv
+
+    header = read_header(path, dialect)
+    if len(set(header)) < len(header):
+        raise ValueError('ERROR. Repeated column names are renamed by pandas\' parser only.')
+
+    text_columns = [column for column, column_dtype in dtype.items() if str(column_dtype) == 'category' and column in header]
+    convert_options = arrow_csv.ConvertOptions(
+        column_types={column: pa.string() for column in text_columns},
+        null_values=sorted(set(default_na_values) | set(na_values)),
+        true_values=['True', 'TRUE', 'true'],
+        false_values=['False', 'FALSE', 'false'],
+        strings_can_be_null=True,
+        include_columns=[column for column in header if column in usecols] if usecols is not None else None,
+        decimal_point=dialect['decimal'],
+    )
+    encoding = 'utf8' if dialect['encoding'] in ('utf-8', 'utf-8-sig') else dialect['encoding']  # pyarrow skips the byte order mark
+    table = arrow_csv.read_csv(path, read_options=arrow_csv.ReadOptions(encoding=encoding, use_threads=True),
+                               parse_options=arrow_csv.ParseOptions(delimiter=dialect['delimiter']),
+                               convert_options=convert_options)
+
+    for position, field in enumerate(table.schema):
+        if pa.types.is_temporal(field.type):
+            raise ValueError(f'ERROR. pyarrow reads column "{field.name}" as dates, pandas\' parser keeps it as text.')
+        if pa.types.is_null(field.type):
+            table = table.set_column(position, field.name, table.column(position).cast(pa.float64()))  # Empty columns
+    return table
+
+
+def read_csv(path, dialect=None, **read_csv_kwargs):
+    """
+    pandas.read_csv with the dialect of the file (sniffed when not given), parsed by
+    pyarrow's multithreaded reader when possible and by pandas' parser otherwise
+    """
+    import pandas as pd
+
+    dialect = dialect or sniff_csv(path)
+    options = dict(sep=dialect['delimiter'], encoding=dialect['encoding'], decimal=dialect['decimal'],
+                   float_precision='round_trip')  # Correctly rounded numbers, as pyarrow reads them
+    options.update(read_csv_kwargs)
+
+    arrow_options = set(read_csv_kwargs) <= {'dtype', 'na_values', 'usecols'}
+    if use_arrow and arrow_options:
+        import pyarrow as pa
+
+        dtype = read_csv_kwargs.get('dtype') or {}
+        try:
+            table = arrow_table(path, dialect, dtype, read_csv_kwargs.get('na_values') or [], read_csv_kwargs.get('usecols'))
+            dataframe = table.to_pandas()
+            dtypes = {column: column_dtype for column, column_dtype in dtype.items() if column in dataframe.columns}
+            for column in dataframe.columns[dataframe.isna().all()]:
+                if str(dtypes.get(column)) == 'category':
+                    dtypes[column] = pd.CategoricalDtype(pd.Index([], dtype=object))  # No categories, as pandas' parser gives
+            return dataframe.astype(dtypes)
+        except (pa.ArrowInvalid, ValueError, TypeError):
+            pass  # pandas' parser gives the same result or a clearer error (e.g. for a value that doesn't fit its dtype)
+    return pd.read_csv(path, **options)
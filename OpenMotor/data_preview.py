@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Windowed preview of a dataset
+
+ A preview model keeps one array per column (the dataframe's own buffers,
+ nothing is copied) and turns only the rows of the requested window into
+ display values. The Tk viewer holds a few pages of rows at a time and
+ swaps pages in and out as the user scrolls, so it opens instantly and
+ stays responsive for any number of trials. The quality check prints the
+ first window of the same model as text.
+
+ Usage:
+    model = preview_model(df)
+    rows = window_rows(model, 0, 8)
+    print(window_text(model, 0, 8))
+
+    show_preview(root, df, title='Updated CSV Content')   # needs tkinter
+
+--------------------------------------------------------------------------
+"""
+
+import pandas as pd
+
+
+# Rows added or dropped at a time while scrolling the viewer
+page_rows = 200
+
+# Pages held by the viewer at once
+window_pages = 3
+
+
+def preview_model(dataframe):
+    """ Windowed view of a dataframe: its column names and one array per column """
+    return {
+        'columns': [str(column) for column in dataframe.columns],
+        'arrays': [dataframe.iloc[:, position].array for position in range(dataframe.shape[1])],
+        'num_rows': len(dataframe),
+    }
+
+
+def display_value(value):
+    """ Text shown for one cell (missing values are left blank) """
+    return '' if pd.isna(value) else str(value)
+
+
+def window_rows(model, start, stop):
+    """ Display values of rows start to stop, one tuple per row; only these rows are materialized """
+    start = max(0, start)
+    stop = min(stop, model['num_rows'])
+    if start >= stop:
+        return []
+    columns = [[display_value(value) for value in array[start:stop]] for array in model['arrays']]
+    return list(zip(*columns))
+
+
+def window_text(model, start, stop):
+    """ Rows start to stop as a printable table, laid out like a printed dataframe """
+    start = max(0, start)
+    rows = window_rows(model, start, stop)
+    return str(pd.DataFrame(rows, columns=model['columns'], index=range(start, start + len(rows))))
+
+
+def show_preview(parent, dataframe, title='Data preview'):
+    """ Open a window showing a dataframe in a Treeview that loads rows as the user scrolls """
+    import tkinter as tk
+    from tkinter import ttk
+
+    model = preview_model(dataframe)
+    held_rows = page_rows * window_pages
+
+    preview_window = tk.Toplevel(parent)
+    preview_window.title(title)
+    preview_window.geometry('800x400')
+    preview_window.configure(bg='#f0f4f7')
+
+    status = ttk.Label(preview_window)
+    status.pack(side=tk.BOTTOM, fill=tk.X)
+    frame = ttk.Frame(preview_window)
+    frame.pack(expand=True, fill=tk.BOTH)
+
+    # Column ids are positions, so repeated column names still get their own column
+    column_ids = [str(position) for position in range(len(model['columns']))]
+    tree = ttk.Treeview(frame, columns=column_ids, show='headings')
+    for column_id, name in zip(column_ids, model['columns']):
+        tree.heading(column_id, text=name)
+        tree.column(column_id, width=100, stretch=False)
+
+    vertical = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+    horizontal = ttk.Scrollbar(frame, orient=tk.HORIZONTAL, command=tree.xview)
+    tree.configure(xscrollcommand=horizontal.set)
+    vertical.pack(side=tk.RIGHT, fill=tk.Y)
+    horizontal.pack(side=tk.BOTTOM, fill=tk.X)
+    tree.pack(expand=True, fill=tk.BOTH)
+
+    held = {'start': 0, 'stop': 0, 'loading': False}
+
+    def load(start, first_visible):
+        """ Hold rows start to start + held_rows in the tree and scroll to first_visible """
+        start = max(0, min(start, model['num_rows'] - held_rows))
+        tree.delete(*tree.get_children())
+        for values in window_rows(model, start, start + held_rows):
+            tree.insert('', tk.END, values=values)
+        held['start'], held['stop'] = start, min(start + held_rows, model['num_rows'])
+        if held['stop'] > held['start']:
+            tree.yview_moveto((first_visible - start) / (held['stop'] - held['start']))
+        status.configure(text=f'Rows {held["start"] + 1:,} to {held["stop"]:,} of {model["num_rows"]:,}')
+        held['loading'] = False
+
+    def on_scroll(first, last):
+        """ Swap a page in when the view nears either end of the rows held """
+        vertical.set(first, last)
+        if held['loading']:
+            return
+        first, last = float(first), float(last)
+        first_visible = held['start'] + int(first * (held['stop'] - held['start']))
+        if last >= 0.99 and held['stop'] < model['num_rows']:
+            held['loading'] = True
+            tree.after_idle(load, held['start'] + page_rows, first_visible)
+        elif first <= 0.01 and held['start'] > 0:
+            held['loading'] = True
+            tree.after_idle(load, held['start'] - page_rows, first_visible)
+
+    tree.configure(yscrollcommand=on_scroll)
+    load(0, 0)
+    return preview_window
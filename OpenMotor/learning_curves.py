@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Learning curves over standardized Motor Learning datasets
+
+ The error of every trial is the hand angle relative to the target angle,
+ wrapped onto -180 to 180 degrees (so 350 vs 10 degrees is -20, not 340),
+ multiplied by rotation_direction and mirrored on trials with hand_flip == 1.
+ Errors are then reduced per group (subject, block, condition, ...) and
+ optionally per bin of trials, with bincount and one sort over NumPy arrays,
+ never a Python loop over trials or groups.
+
+ Usage:
+    from learning_curves import learning_curve
+    per_subject = learning_curve(dataframe, by=['Subj_idx'], bin_size=10)
+    per_block = learning_curve(dataframe, by=['Subj_idx', 'block_number'], x=None)
+    per_condition = learning_curve(dataframe, by=['condition'], statistics=['mean', 'median', 'sem'])
+
+ Any table with the schema columns works: a dataframe, or the columns of a
+ memory-mapped dataset (motor_columns.open_dataset(...)['columns']).
+
+--------------------------------------------------------------------------
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Statistics learning_curve can compute for every group
+all_statistics = ['mean', 'median', 'std', 'sem']
+
+
+def column_values(table, column, dtype='float64'):
+    """ Values of one column as a NumPy array, missing values as NaN """
+    values = table[column]
+    if hasattr(values, 'to_numpy'):
+        return values.to_numpy(dtype=dtype, na_value=np.nan)
+    return np.asarray(values, dtype=dtype)
+
+
+def wrap_angle(angles):
+    """ Angles in degrees wrapped onto -180 (inclusive) to 180 (exclusive) """
+    return np.mod(angles + 180.0, 360.0) - 180.0
+
+
+def hand_error(table):
+    """
+    Error of every trial in degrees: hand_angle - target_angle on the circle, times
+    rotation_direction (trials without one count as +1), mirrored where hand_flip == 1
+    """
+    error = wrap_angle(column_values(table, 'hand_angle') - column_values(table, 'target_angle'))
+
+    direction = column_values(table, 'rotation_direction')
+    error *= np.where(np.isnan(direction) | (direction == 0), 1.0, np.sign(direction))
+
+    flipped = column_values(table, 'hand_flip') == 1
+    error[flipped] = -error[flipped]
+    return error
+
+
+def group_codes(keyed, columns, num_rows):
+    """ Integer group of every row for the given key columns, and the key values of each group """
+    codes = np.zeros(num_rows, dtype='int64')
+    keys = {}
+    for column in columns:
+        column_codes, uniques = pd.factorize(keyed[column], sort=True, use_na_sentinel=False)
+        codes = codes * len(uniques) + column_codes
+        keys[column] = np.asarray(uniques)
+
+    # Renumber so that group i is the i-th combination that actually occurs, in sorted key order
+    codes, groups = pd.factorize(codes, sort=True)
+    if not columns:
+        return codes, {}
+    positions = np.unravel_index(groups, [len(uniques) for uniques in keys.values()])
+    return codes, {column: uniques[position] for (column, uniques), position in zip(keys.items(), positions)}
+
+
+def grouped_median(codes, values, num_groups):
+    """ Median of values in every group (NaN for a group without values), from one sort """
+    # Sorting by value, then stably by group, is about twice as fast as lexsort on both
+    order = np.argsort(values)
+    order = order[np.argsort(codes[order], kind='stable')]
+    counts = np.bincount(codes, minlength=num_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    medians = np.full(num_groups, np.nan)
+    present = counts > 0
+    low = order[starts[present] + (counts[present] - 1) // 2]
+    high = order[starts[present] + counts[present] // 2]
+    medians[present] = (values[low] + values[high]) / 2
+    return medians
+
+
+def grouped_statistics(codes, values, num_groups, statistics):
+    """ Number of values and the requested statistics of every group; NaN values are left out """
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+
+    counts = np.bincount(codes, minlength=num_groups)
+    sums = np.bincount(codes, weights=values, minlength=num_groups)
+    result = {'num_trials': counts}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        if 'mean' in statistics:
+            result['mean_error'] = means
+        if 'median' in statistics:
+            result['median_error'] = grouped_median(codes, values, num_groups)
+        if 'std' in statistics or 'sem' in statistics:
+            squares = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=num_groups)
+            std = np.sqrt(squares / (counts - 1))
+            if 'std' in statistics:
+                result['std_error'] = std
+            if 'sem' in statistics:
+                result['sem_error'] = std / np.sqrt(counts)
+    return result
+
+
+def learning_curve(table, by=('Subj_idx',), x='trial_number', bin_size=None, statistics=('mean', 'median')):
+    """
+    Error statistics per group of trials, as a dataframe with one row per group.
+    by    - key columns, e.g. ['Subj_idx'], ['Subj_idx', 'block_number'] or ['condition']
+    x     - column along the curve (None for one value per group)
+    bin_size - group x into bins of this many values; a bin is named by its first value,
+               counting from 1 (bins of 10 trials are 1, 11, 21, ...)
+    """
+    unknown = [statistic for statistic in statistics if statistic not in all_statistics]
+    if unknown:
+        raise ValueError(f'ERROR. Unknown statistics {unknown}; choose from {all_statistics}.')
+
+    error = hand_error(table)
+    columns = list(by)
+    keyed = {column: table[column] for column in columns}
+    if x is not None:
+        x_values = column_values(table, x)
+        if bin_size:
+            x_values = np.floor((x_values - 1) / bin_size) * bin_size + 1
+            x = f'{x}_bin'
+        keyed[x] = x_values
+        columns.append(x)
+
+    codes, key_values = group_codes(keyed, columns, len(error))
+    curve = pd.DataFrame(key_values, index=range(codes.max() + 1 if len(codes) else 0))
+    for name, values in grouped_statistics(codes, error, len(curve), statistics).items():
+        curve[name] = values
+    return curve
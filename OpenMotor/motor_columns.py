@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Memory-mapped numeric columns of accepted Motor Learning datasets
+
+ The numeric trial columns used in analysis are written once per dataset as
+     <cache>/<Name_in_database>/<column>.npy
+ with the rows sorted by subject, block and trial (subject_stats.subject_index),
+ plus subjects.npy and offsets.npy: the trials of subjects[i] are rows
+ offsets[i] to offsets[i + 1].
+
+ Opening a dataset maps the files instead of reading them, so it takes
+ milliseconds whatever the size, and worker processes that open the same
+ dataset share its pages through the operating system.
+
+ Usage:
+    from motor_columns import open_dataset, subject_columns
+    dataset = open_dataset(cache, 'Tsay_2019_Expt1')
+    dataset['columns']['hand_angle'].mean()
+    trials = subject_columns(dataset, 3, ['trial_number', 'hand_angle'])
+
+    python open_motor.py folder --column-cache columns/
+
+--------------------------------------------------------------------------
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from motor_schema import column_dtypes
+from subject_stats import subject_index
+
+
+# Columns kept in the cache (block_number is kept because rows are sorted by it,
+# rotation_direction and hand_flip because learning curves need them)
+mapped_columns = ['Subj_idx', 'block_number', 'trial_number', 'hand_angle', 'target_angle',
+                  'rotation_angle', 'reaction_time', 'movement_time', 'rotation_direction', 'hand_flip']
+
+def dataset_path(cache_path, dataset_name):
+    """ Folder holding the column files of one dataset """
+    return os.path.join(cache_path, dataset_name)
+
+
+def column_array(dataframe, column):
+    """
+    Plain NumPy array of one column. Integer columns keep their integer type unless
+    they have missing values, in which case they are stored as float64 with NaN.
+    """
+    dtype = column_dtypes[column]
+    values = dataframe[column]
+    if dtype.startswith('Int'):
+        if not values.isna().any():
+            return values.to_numpy(dtype=dtype.lower())
+        if column == 'Subj_idx':
+            raise ValueError(f'ERROR. Field "{column}" has missing values; every trial needs a subject to be indexed.')
+        dtype = 'float64'
+    return values.to_numpy(dtype=dtype, na_value=np.nan)
+
+
+def write_columns(dataframe, cache_path, dataset_name):
+    """ Write the mapped columns of one dataset to the cache, replacing any earlier copy """
+    arrays = {column: column_array(dataframe, column) for column in mapped_columns}
+    index = subject_index(dataframe)
+    order, offsets = index['order'], index['offsets']
+    subjects = index['subjects'].to_numpy(dtype=arrays['Subj_idx'].dtype)
+
+    # Write next to the final folder and swap it in, so readers never see half a dataset
+    path = dataset_path(cache_path, dataset_name)
+    staging_path = f'{path}.partial-{os.getpid()}'
+    if os.path.isdir(staging_path):
+        shutil.rmtree(staging_path)
+    os.makedirs(staging_path)
+    for column, values in arrays.items():
+        np.save(os.path.join(staging_path, f'{column}.npy'), values[order])
+    np.save(os.path.join(staging_path, 'subjects.npy'), subjects)
+    np.save(os.path.join(staging_path, 'offsets.npy'), offsets)
+    with open(os.path.join(staging_path, 'dataset.json'), 'w') as file:
+        json.dump({'name': dataset_name, 'num_rows': len(order), 'columns': mapped_columns}, file)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(staging_path, path)
+    return path
+
+
+def list_datasets(cache_path):
+    """ Names of all datasets in a cache """
+    if not os.path.isdir(cache_path):
+        return []
+    return sorted(entry for entry in os.listdir(cache_path)
+                  if os.path.exists(os.path.join(cache_path, entry, 'dataset.json')))
+
+
+def open_dataset(cache_path, dataset_name):
+    """
+    Memory-map one dataset: a dict with its name, num_rows, columns (one read-only
+    array per column), subjects, offsets and position (subject -> index into offsets)
+    """
+    path = dataset_path(cache_path, dataset_name)
+    if not os.path.exists(os.path.join(path, 'dataset.json')):
+        raise ValueError(f'ERROR. Dataset {dataset_name} is not in the column cache at {cache_path}.')
+    with open(os.path.join(path, 'dataset.json')) as file:
+        description = json.load(file)
+
+    subjects = np.load(os.path.join(path, 'subjects.npy'))
+    return {
+        'name': description['name'],
+        'num_rows': description['num_rows'],
+        'columns': {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+                    for column in description['columns']},
+        'subjects': subjects,
+        'offsets': np.load(os.path.join(path, 'offsets.npy')),
+        'position': {subject.item(): index for index, subject in enumerate(subjects)},
+    }
+
+
+def subject_rows(dataset, subject):
+    """ Slice of the rows of one subject """
+    index = dataset['position'].get(subject)
+    if index is None:
+        raise ValueError(f'ERROR. Subject {subject} is not in dataset {dataset["name"]}.')
+    return slice(int(dataset['offsets'][index]), int(dataset['offsets'][index + 1]))
+
+
+def subject_columns(dataset, subject, columns=None):
+    """ Views (no copies) of the columns of one subject's trials """
+    rows = subject_rows(dataset, subject)
+    return {column: dataset['columns'][column][rows] for column in (columns or dataset['columns'])}
+
+
+def trials_per_subject(dataset):
+    """ Number of trials of every subject, straight from the offsets """
+    return dict(zip(dataset['subjects'].tolist(), np.diff(dataset['offsets']).tolist()))
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Motor Learning Database: one SQLite file holding every accepted dataset
+
+ Two tables:
+    datasets - the catalog, one row per dataset from the description spreadsheets
+    trials   - every trial of every dataset in the standardized columns,
+               plus a 'dataset' column naming the dataset it belongs to
+
+ trials is indexed on dataset + subject + trial, on condition and on
+ neuro_condition, so queries across studies don't re-read any CSV.
+
+ Datasets are added by motor_outputs.py (open_motor.py --database PATH).
+
+ Usage:
+    from motor_database import query_trials
+    df = query_trials('motor.db', columns=['dataset', 'Subj_idx', 'hand_angle'],
+                      where='rotation_angle != 0 AND neuro_condition = ?', params=['PD'])
+
+    python motor_database.py motor.db --where "rotation_angle != 0" --columns dataset Subj_idx hand_angle
+
+--------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+from motor_schema import column_dtypes, required_columns, widen_floats
+
+
+# Columns of the description spreadsheet (Open_Motor Description Template.xlsx)
+catalog_columns = [
+    'Category', 'Name_in_database', 'Authors', 'Journal', 'Year', 'Expt_in_paper', 'Condition',
+    'Num_subjects', 'Min_trials_per_subject', 'Max_trials_per_subject', 'Num_tasks_x_conditions',
+    'Movement_type', 'Feedback_type', 'Reaction_time_measurement', 'Movement_time_measurement',
+    'Cognitive_assessment_used', 'Neuro_condition_involved', 'Notes'
+]
+
+# Catalog columns stored as numbers
+catalog_integer_columns = ['Year', 'Num_subjects', 'Min_trials_per_subject', 'Max_trials_per_subject', 'Num_tasks_x_conditions']
+
+# Rows inserted per executemany call when loading a dataset
+insert_chunk_rows = 50_000
+
+
+def sql_type(dtype):
+    """ SQLite column type for a schema dtype """
+    if dtype.startswith('Int'):
+        return 'INTEGER'
+    if dtype.startswith('float'):
+        return 'REAL'
+    return 'TEXT'
+
+
+def connect(database_path):
+    """ Open the database, creating the tables and indexes if needed """
+    connection = sqlite3.connect(database_path)
+    connection.execute('PRAGMA journal_mode=WAL')
+
+    catalog_definition = ', '.join(f'"{column}" {"INTEGER" if column in catalog_integer_columns else "TEXT"}'
+                                   for column in catalog_columns if column != 'Name_in_database')
+    connection.execute(f'CREATE TABLE IF NOT EXISTS datasets ('
+                       f'"Name_in_database" TEXT PRIMARY KEY, {catalog_definition}, folder TEXT)')
+
+    trials_definition = ', '.join(f'"{column}" {sql_type(column_dtypes[column])}' for column in required_columns)
+    connection.execute(f'CREATE TABLE IF NOT EXISTS trials (dataset TEXT NOT NULL, {trials_definition})')
+    connection.execute('CREATE INDEX IF NOT EXISTS trials_subject ON trials (dataset, Subj_idx, trial_number)')
+    connection.execute('CREATE INDEX IF NOT EXISTS trials_condition ON trials (condition)')
+    connection.execute('CREATE INDEX IF NOT EXISTS trials_neuro_condition ON trials (neuro_condition)')
+    return connection
+
+
+def to_rows(dataframe, dataset_name):
+    """ Rows of a dataframe in trials-table column order, with missing values as None """
+    table = widen_floats(dataframe[required_columns]).astype(object)
+    table = table.where(table.notna(), None)
+    table.insert(0, 'dataset', dataset_name)
+    return table.itertuples(index=False, name=None)
+
+
+def catalog_value(column, value):
+    """ Spreadsheet cell as stored in the catalog """
+    if value is None or pd.isna(value):
+        return None
+    if column in catalog_integer_columns:
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    return str(value)
+
+
+def insert_trials(connection, dataset_name, chunk):
+    """ Insert the trials of one dataframe chunk (in the caller's transaction) """
+    placeholders = ', '.join(['?'] * (len(required_columns) + 1))
+    column_list = ', '.join(['dataset'] + [f'"{column}"' for column in required_columns])
+    connection.executemany(f'INSERT INTO trials ({column_list}) VALUES ({placeholders})', to_rows(chunk, dataset_name))
+
+
+def add_dataset(connection, dataset_name, chunks, catalog_row=None, folder=None):
+    """ Replace one dataset in the database with the given dataframe chunks (in a single transaction) """
+    with connection:
+        connection.execute('DELETE FROM trials WHERE dataset = ?', (dataset_name,))
+        for chunk in chunks:
+            insert_trials(connection, dataset_name, chunk)
+
+        catalog_row = dict(catalog_row or {})
+        catalog_row['Name_in_database'] = dataset_name
+        values = [catalog_value(column, catalog_row.get(column)) for column in catalog_columns]
+        columns = ', '.join(f'"{column}"' for column in catalog_columns)
+        connection.execute(f'INSERT OR REPLACE INTO datasets ({columns}, folder) '
+                           f'VALUES ({", ".join(["?"] * len(catalog_columns))}, ?)', values + [folder])
+
+
+def frame_chunks(dataframe, chunk_rows=None):
+    """ A dataframe in slices of chunk_rows rows, so rows are converted for insertion a slice at a time """
+    chunk_rows = chunk_rows or insert_chunk_rows
+    return (dataframe.iloc[start:start + chunk_rows] for start in range(0, len(dataframe), chunk_rows))
+
+
+def read_catalog(spreadsheet_file):
+    """ Rows of a description spreadsheet, indexed by dataset name """
+    return pd.read_excel(spreadsheet_file).set_index('Name_in_database', drop=False)
+
+
+def list_studies(database_path):
+    """ The catalog of all datasets in the database """
+    connection = connect(database_path)
+    try:
+        return pd.read_sql_query('SELECT * FROM datasets ORDER BY Name_in_database', connection)
+    finally:
+        connection.close()
+
+
+def query_trials(database_path, columns=None, where=None, params=(), datasets=None):
+    """
+    Trials across all studies as a dataframe.
+    where is an SQL condition on the trials columns ('?' placeholders are filled from params);
+    datasets restricts the query to the given dataset names.
+    """
+    selected = ', '.join(f'"{column}"' for column in columns) if columns else '*'
+    conditions = []
+    params = list(params)
+    if where:
+        conditions.append(f'({where})')
+    if datasets is not None:
+        datasets = list(datasets)
+        conditions.append(f'dataset IN ({", ".join(["?"] * len(datasets))})')
+        params += datasets
+
+    statement = f'SELECT {selected} FROM trials'
+    if conditions:
+        statement += ' WHERE ' + ' AND '.join(conditions)
+
+    connection = connect(database_path)
+    try:
+        return pd.read_sql_query(statement, connection, params=params)
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    """ Query the database from the command line and print the trials as CSV """
+    parser = argparse.ArgumentParser(description='Query trials across all datasets of the Motor Learning Database.')
+    parser.add_argument('database', help='path of the SQLite database')
+    parser.add_argument('--where', help='SQL condition on the trial columns, e.g. "rotation_angle != 0"')
+    parser.add_argument('--columns', nargs='+', help='columns to return (default: all)')
+    parser.add_argument('--datasets', nargs='+', help='only these datasets')
+    parser.add_argument('--studies', action='store_true', help='list the catalog of datasets instead of trials')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        raise ValueError(f'ERROR. No database found at {args.database}.')
+
+    if args.studies:
+        result = list_studies(args.database)
+    else:
+        result = query_trials(args.database, args.columns, args.where, datasets=args.datasets)
+    result.to_csv(sys.stdout, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
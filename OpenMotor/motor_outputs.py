@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Outputs of accepted submissions: Parquet store, SQLite database and
+ memory-mapped column cache
+
+ Every data file of a passing submission is read once, and that one read
+ feeds every output asked for. Files up to the stream threshold are loaded
+ whole with the fast reader; larger files are read in chunks, and each chunk
+ is appended to the store and inserted into the database before the next
+ one is read. The column cache sorts every dataset by subject, so it keeps
+ its numeric columns (not the whole file) until the last chunk is read.
+
+ Usage:
+    from motor_outputs import write_submission
+    write_submission(report, store_path='store/', database_path='motor.db', column_cache_path='columns/')
+
+    python open_motor.py folder --store store/ --database motor.db --column-cache columns/
+
+--------------------------------------------------------------------------
+"""
+
+import os
+
+from csv_ingest import read_header
+from motor_schema import chunk_dtypes, iter_data_csv, read_data_csv
+from qc_trace import span
+
+# The store, database and column cache modules load pandas, pyarrow and NumPy, so each
+# is imported only when its output is asked for
+
+
+def write_whole(dataframe, dataset_name, outputs):
+    """ Write one dataset loaded whole to every output """
+    if outputs['store']:
+        from motor_store import write_dataset
+        write_dataset(dataframe, outputs['store'], dataset_name)
+    if outputs['connection']:
+        from motor_database import add_dataset, frame_chunks
+        add_dataset(outputs['connection'], dataset_name, frame_chunks(dataframe),
+                    outputs['catalog'].loc[dataset_name].to_dict(), outputs['folder'])
+    if outputs['column_cache']:
+        from motor_columns import write_columns
+        write_columns(dataframe, outputs['column_cache'], dataset_name)
+
+
+def write_streamed(chunks, dataset_name, outputs):
+    """ Write one dataset read in chunks to every output, a chunk at a time """
+    import pandas as pd
+
+    consumers = []
+    dataset_writer = None
+    if outputs['store']:
+        from motor_store import close_dataset_writer, open_dataset_writer, write_chunk
+        dataset_writer = open_dataset_writer(outputs['store'], dataset_name)
+        consumers.append(lambda chunk: write_chunk(dataset_writer, chunk))
+    column_chunks = []
+    if outputs['column_cache']:
+        from motor_columns import mapped_columns, write_columns
+        consumers.append(lambda chunk: column_chunks.append(chunk[mapped_columns]))
+
+    def fed_chunks():
+        """ The chunks of the file, each handed to the store and column cache as it passes """
+        for chunk in chunks:
+            for consumer in consumers:
+                consumer(chunk)
+            yield chunk
+
+    try:
+        if outputs['connection']:
+            # The database inserts the chunks as they come, in one transaction
+            from motor_database import add_dataset
+            add_dataset(outputs['connection'], dataset_name, fed_chunks(),
+                        outputs['catalog'].loc[dataset_name].to_dict(), outputs['folder'])
+        else:
+            for _ in fed_chunks():
+                pass
+    finally:
+        if dataset_writer is not None:
+            close_dataset_writer(dataset_writer)
+
+    if column_chunks:
+        write_columns(pd.concat(column_chunks, ignore_index=True), outputs['column_cache'], dataset_name)
+
+
+def write_submission(report, store_path=None, database_path=None, column_cache_path=None,
+                     stream_threshold_bytes=None, chunk_rows=None):
+    """
+    Write every dataset of a submission that passed the quality check to the outputs given,
+    reading each data file once. Files larger than stream_threshold_bytes are read chunk_rows rows at a time.
+    """
+    if not report['passed']:
+        raise ValueError(f'ERROR. Submission {report["folder"]} did not pass the quality check and cannot be saved.')
+    if not (store_path or database_path or column_cache_path):
+        return
+
+    outputs = {'store': store_path, 'connection': None, 'catalog': None, 'column_cache': column_cache_path,
+               'folder': report['folder']}
+    if database_path:
+        from motor_database import connect, read_catalog
+        outputs['catalog'] = read_catalog(report['spreadsheet_file'])
+        outputs['connection'] = connect(database_path)
+    try:
+        for dataset_report in report['datasets']:
+            datafile, dataset_name = dataset_report['datafile'], dataset_report['name']
+            stream = stream_threshold_bytes is not None and os.path.getsize(datafile) > stream_threshold_bytes
+            with span('write_outputs', dataset=dataset_name, streamed=stream) as record:
+                if stream:
+                    chunks = (chunk for chunk, _ in iter_data_csv(datafile, chunk_rows, dtype=chunk_dtypes(read_header(datafile))))
+                    write_streamed(chunks, dataset_name, outputs)
+                else:
+                    dataframe, _ = read_data_csv(datafile)
+                    write_whole(dataframe, dataset_name, outputs)
+                record['rows'] = dataset_report['num_rows']
+    finally:
+        if outputs['connection'] is not None:
+            outputs['connection'].close()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Standardized schema of the Motor Learning Dataset
+
+ Lists the columns every data file must contain and the compact dtype each
+ one is stored with: categorical for labels and enums, small nullable
+ integers for indices and counts, float32 for angles, times and positions.
+
+ Usage:
+    from motor_schema import read_data_csv
+    dataframe, violations = read_data_csv(datafile)
+
+ violations maps each column whose values don't fit its dtype to an error
+ message; those columns are left as they were read.
+
+ Missing values stay missing (NA in the nullable dtypes) in memory and in
+ the stores. "None Provided" is read as missing, and only written back when
+ a dataset is exported for people with a missing value marker (see
+ output_writers.py).
+
+--------------------------------------------------------------------------
+"""
+
+# pandas and NumPy are imported by the functions that use them, so the column
+# lists below can be used (e.g. for header checks) without loading either
+
+
+# List of all expected columns
+required_columns = [
+    'Subj_idx', 'trial_number', 'target_angle', 'feedback_type', 'rotation_angle',
+    'hand_angle', 'reaction_time', 'movement_time', 'search_time', 'screen_height',
+    'screen_width', 'repeat_number', 'researcher_id', 'condition', 'block_number',
+    'research_setting', 'input_device', 'subject_age', 'subject_sex', 'subject_race',
+    'neuro_condition', 'neuro_description', 'years_of_education', 'subject_vision',
+    'dominant_hand', 'device_type', 'mouse_type', 'feedback_time', 'initial_x',
+    'initial_y', 'number_of_targets', 'target_type', 'target_height', 'target_width',
+    'target_x', 'target_y', 'clamp_size', 'rotation_direction', 'hand_flip',
+    'hand_base', 'hand_max_velocity', 'cognitive_assessment', 'cognitive_assessment_score'
+]
+
+# Compact dtype of every required column (nullable integers, so missing values are allowed)
+column_dtypes = {
+    # Indices and counts
+    'Subj_idx': 'Int32',
+    'trial_number': 'Int32',
+    'block_number': 'Int16',
+    'repeat_number': 'Int16',
+    'number_of_targets': 'Int16',
+    'rotation_direction': 'Int8',
+    'hand_flip': 'Int8',
+
+    # Angles, times, sizes and positions
+    'target_angle': 'float32',
+    'rotation_angle': 'float32',
+    'hand_angle': 'float32',
+    'reaction_time': 'float32',
+    'movement_time': 'float32',
+    'search_time': 'float32',
+    'feedback_time': 'float32',
+    'screen_height': 'float32',
+    'screen_width': 'float32',
+    'subject_age': 'float32',
+    'years_of_education': 'float32',
+    'initial_x': 'float32',
+    'initial_y': 'float32',
+    'target_height': 'float32',
+    'target_width': 'float32',
+    'target_x': 'float32',
+    'target_y': 'float32',
+    'clamp_size': 'float32',
+    'hand_base': 'float32',
+    'hand_max_velocity': 'float32',
+    'cognitive_assessment_score': 'float32',
+
+    # Labels and enums
+    'feedback_type': 'category',
+    'researcher_id': 'category',
+    'condition': 'category',
+    'research_setting': 'category',
+    'input_device': 'category',
+    'subject_sex': 'category',
+    'subject_race': 'category',
+    'neuro_condition': 'category',
+    'neuro_description': 'category',
+    'subject_vision': 'category',
+    'dominant_hand': 'category',
+    'device_type': 'category',
+    'mouse_type': 'category',
+    'target_type': 'category',
+    'cognitive_assessment': 'category',
+}
+
+# Text that stands for a missing value in files meant for people
+missing_marker = 'None Provided'
+
+# Cell values read as a missing value
+missing_value_markers = [missing_marker]
+
+
+def is_integer_dtype(dtype):
+    """ True for the nullable integer dtypes of the schema """
+    return dtype.startswith('Int')
+
+
+def parse_dtypes():
+    """
+    Dtypes handed to read_csv. Integers are parsed as Int64 and narrowed by
+    apply_schema, because read_csv silently wraps values that overflow a small integer.
+    """
+    return {column: 'Int64' if is_integer_dtype(dtype) else dtype for column, dtype in column_dtypes.items()}
+
+
+def violation_message(column, kind, detail):
+    """ Error message for values of a column that don't fit its dtype """
+    if kind == 'not_numeric':
+        examples = ', '.join(repr(value) for value in detail)
+        return f'ERROR. Field "{column}" must be numeric but contains values such as {examples}.'
+    if kind == 'not_whole':
+        return f'ERROR. Field "{column}" must contain whole numbers only.'
+    return f'ERROR. Field "{column}" has values outside {detail[0]} to {detail[1]}.'
+
+
+def apply_schema(dataframe, found=None):
+    """
+    Convert the schema columns of a dataframe to their compact dtypes (in place).
+    Returns {column: error message} for columns whose values don't fit. For a file read
+    in chunks, pass the same found dict with every chunk: the messages then describe all
+    chunks so far, as they would read for the whole file.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Column -> (kind, detail) of its violation; a kind earlier in this list is reported over a later one
+    kinds = ['not_numeric', 'not_whole', 'out_of_range']
+    found = {} if found is None else found
+    for column, dtype in column_dtypes.items():
+        if column not in dataframe.columns:
+            continue
+        values = dataframe[column]
+        if str(values.dtype) == dtype:
+            continue
+
+        if dtype == 'category':
+            dataframe[column] = values.astype('category')
+            continue
+
+        numbers = pd.to_numeric(values, errors='coerce')
+        not_numeric = numbers.isna() & values.notna()
+        violation = None
+        if not_numeric.any():
+            examples = list(found[column][1]) if found.get(column, ('',))[0] == 'not_numeric' else []
+            examples += [value for value in values[not_numeric].unique() if value not in examples]
+            violation = ('not_numeric', examples[:3])
+        elif is_integer_dtype(dtype):
+            limits = np.iinfo(dtype.lower())
+            if (numbers.dropna() % 1 != 0).any():
+                violation = ('not_whole', None)
+            elif (numbers < limits.min).any() or (numbers > limits.max).any():
+                violation = ('out_of_range', (limits.min, limits.max))
+
+        if violation is None:
+            dataframe[column] = numbers.astype(dtype)
+        elif column not in found or kinds.index(violation[0]) <= kinds.index(found[column][0]):
+            found[column] = violation
+    return {column: violation_message(column, *found[column]) for column in column_dtypes if column in found}
+
+
+def infer_nullable_dtypes(dataframe):
+    """
+    Give the text columns outside the schema a compact nullable dtype (in place):
+    numbers if all their values are numbers, categorical otherwise
+    """
+    import pandas as pd
+
+    for column in dataframe.columns:
+        values = dataframe[column]
+        if column in column_dtypes or not (values.dtype == object or isinstance(values.dtype, pd.StringDtype)):
+            continue
+        numbers = pd.to_numeric(values, errors='coerce')
+        if numbers.isna().equals(values.isna()):
+            dataframe[column] = numbers
+        else:
+            dataframe[column] = values.astype('category')
+
+
+def category_dtypes():
+    """ Dtypes handed to read_csv when numbers are read leniently: categorical columns only, so their categories are text """
+    return {column: dtype for column, dtype in column_dtypes.items() if dtype == 'category'}
+
+
+def chunk_dtypes(header):
+    """
+    Dtypes handed to read_csv when a file is read in chunks for storing: categorical columns
+    as text, and columns outside the schema as text too, since the first chunk can't tell
+    what type they have in later ones
+    """
+    dtypes = category_dtypes()
+    dtypes.update({column: 'str' for column in header if column not in column_dtypes})
+    return dtypes
+
+
+def read_data_csv(path, **read_csv_kwargs):
+    """ Read a data file (in its own dialect, see csv_ingest.py) straight into the schema dtypes; returns (dataframe, violations) """
+    from csv_ingest import read_csv, sniff_csv
+
+    dialect = sniff_csv(path)
+    read_csv_kwargs.setdefault('na_values', missing_value_markers)
+    try:
+        dataframe = read_csv(path, dialect, dtype=parse_dtypes(), **read_csv_kwargs)
+    except (ValueError, TypeError):
+        # Some value doesn't fit its column; read the numbers leniently and find out which
+        dataframe = read_csv(path, dialect, dtype=category_dtypes(), **read_csv_kwargs)
+    return dataframe, apply_schema(dataframe)
+
+
+def iter_data_csv(path, chunk_rows, **read_csv_kwargs):
+    """
+    Read a data file in chunks of chunk_rows rows, yielding (chunk, violations) for each,
+    where violations covers every chunk read so far (the last one covers the whole file).
+    Schema columns get the same dtypes as with read_data_csv (categories are text, e.g. '1', '2').
+    """
+    from csv_ingest import read_csv
+
+    read_csv_kwargs.setdefault('na_values', missing_value_markers)
+    read_csv_kwargs.setdefault('dtype', category_dtypes())
+    found = {}
+    for chunk in read_csv(path, chunksize=chunk_rows, **read_csv_kwargs):
+        yield chunk, apply_schema(chunk, found)
+
+
+def widen_floats(dataframe):
+    """
+    Copy of a dataframe with float32 columns widened to float64 through their
+    shortest decimal text, so 0.654 isn't exported as 0.6539999842643738
+    """
+    import pandas as pd
+
+    widened = dataframe.copy(deep=False)  # Columns are replaced, never modified in place
+    for column in widened.columns:
+        if widened[column].dtype == 'float32':
+            widened[column] = pd.to_numeric(widened[column].astype(str))
+    return widened
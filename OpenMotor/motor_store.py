@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Parquet storage for accepted Motor Learning datasets
+
+ Every accepted dataset is written once, with the standardized dtypes, to
+     <store>/dataset=<Name_in_database>/part-0.parquet
+ sorted by subject, block and trial so that row-group statistics let a
+ filter on Subj_idx (or block_number, trial_number) skip most of a file.
+
+ Datasets are written by motor_outputs.py (open_motor.py --store PATH).
+
+ Usage:
+    from motor_store import load_dataset
+    df = load_dataset(store, columns=['Subj_idx', 'trial_number', 'hand_angle', 'rotation_angle'],
+                      filters=[('dataset', '==', 'Tsay_2019_Expt1'), ('Subj_idx', 'in', [1, 2, 3])])
+
+ Filters use the pyarrow form: a list of (column, op, value) tuples that must
+ all hold, or a list of such lists for OR. Needs the pyarrow package.
+
+--------------------------------------------------------------------------
+"""
+
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from motor_schema import column_dtypes
+
+
+# Rows per Parquet row group; smaller groups let filters skip more, larger ones read faster
+row_group_rows = 128_000
+
+# Order in which rows are stored
+sort_columns = ['Subj_idx', 'block_number', 'trial_number']
+
+# Arrow type of every schema column
+arrow_types = {
+    'Int32': pa.int32(),
+    'Int16': pa.int16(),
+    'Int8': pa.int8(),
+    'float32': pa.float32(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+def dataset_path(store_path, dataset_name):
+    """ Folder holding the Parquet files of one dataset """
+    return os.path.join(store_path, f'dataset={dataset_name}')
+
+
+def list_datasets(store_path):
+    """ Names of all datasets in a store """
+    if not os.path.isdir(store_path):
+        return []
+    return sorted(entry[len('dataset='):] for entry in os.listdir(store_path) if entry.startswith('dataset='))
+
+
+def arrow_schema(dataframe):
+    """ Arrow schema for a dataframe: fixed types for schema columns, inferred for any extra column """
+    inferred = pa.Schema.from_pandas(dataframe, preserve_index=False)
+    fields = []
+    for field in inferred:
+        dtype = column_dtypes.get(field.name)
+        fields.append(pa.field(field.name, arrow_types[dtype]) if dtype else field)
+    return pa.schema(fields, metadata=inferred.metadata)
+
+
+def to_arrow(dataframe, schema):
+    """ Convert a dataframe (or chunk) to an Arrow table with the given schema """
+    return pa.Table.from_pandas(dataframe, schema=schema, preserve_index=False)
+
+
+def write_dataset(dataframe, store_path, dataset_name, partition_cols=None):
+    """
+    Write one dataset to the store, replacing any earlier copy.
+    partition_cols (e.g. ['block_number']) splits it further into one folder per value.
+    """
+    path = dataset_path(store_path, dataset_name)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+    present = [column for column in sort_columns if column in dataframe.columns]
+    if present:
+        dataframe = dataframe.sort_values(present, kind='stable')
+    table = to_arrow(dataframe, arrow_schema(dataframe))
+
+    if partition_cols:
+        pq.write_to_dataset(table, path, partition_cols=partition_cols, row_group_size=row_group_rows)
+    else:
+        os.makedirs(path)
+        pq.write_table(table, os.path.join(path, 'part-0.parquet'), row_group_size=row_group_rows)
+    return path
+
+
+def open_dataset_writer(store_path, dataset_name):
+    """
+    Start writing one dataset to the store chunk by chunk, replacing any earlier copy.
+    Rows are kept in the order they are written; read the chunks with motor_schema.chunk_dtypes.
+    """
+    path = dataset_path(store_path, dataset_name)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    return {'path': path, 'schema': None, 'writer': None}
+
+
+def write_chunk(dataset_writer, chunk):
+    """ Append one chunk to a dataset being written; the first chunk sets the schema """
+    if dataset_writer['writer'] is None:
+        dataset_writer['schema'] = arrow_schema(chunk)
+        dataset_writer['writer'] = pq.ParquetWriter(os.path.join(dataset_writer['path'], 'part-0.parquet'),
+                                                    dataset_writer['schema'])
+    dataset_writer['writer'].write_table(to_arrow(chunk, dataset_writer['schema']), row_group_size=row_group_rows)
+
+
+def close_dataset_writer(dataset_writer):
+    """ Finish a dataset written chunk by chunk; returns its folder """
+    if dataset_writer['writer'] is not None:
+        dataset_writer['writer'].close()
+    return dataset_writer['path']
+
+
+def load_dataset(store_path, columns=None, filters=None, datasets=None):
+    """
+    Read rows and columns from the store into a dataframe. Only the requested
+    columns are read, and filters are pushed down to partitions and row groups.
+    datasets restricts the read to the given dataset names.
+    """
+    if datasets is not None:
+        dataset_filter = ('dataset', 'in', list(datasets))
+        if not filters:
+            filters = [dataset_filter]
+        elif isinstance(filters[0], list):
+            filters = [conjunction + [dataset_filter] for conjunction in filters]
+        else:
+            filters = list(filters) + [dataset_filter]
+
+    table = pq.read_table(store_path, columns=columns, filters=filters, partitioning='hive')
+
+    # Numeric partition columns come back dictionary encoded; decode them to plain numbers
+    for index, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) and not pa.types.is_string(field.type.value_type):
+            table = table.set_column(index, field.name, table.column(index).cast(field.type.value_type))
+    return table.to_pandas()
@@ -7,193 +7,451 @@
  readme files (with 'readme' in their name), and the spreadsheet (.xlsx).
 
  Instructions:
-    - Place this file and all files you're sending in a new folder.
+    - Place all files you're sending in a new folder.
     - When running the file, provide the folder path.
     - The script will automatically find and check the files.
     - Upload your data and results along with the "
 
+ Batch use (no questions asked):
+    python open_motor.py folder1 folder2 ... [--json reports.json] [--write-messages] [--workers N] [--cache PATH]
+                          [--store PATH] [--database PATH] [--column-cache PATH] [--trace PATH [--trace-format chrome]]
+                          [--stream-threshold BYTES] [--chunk-rows N]
+
+ From Python:
+    from open_motor import validate_submission
+    report = validate_submission(folder_path)
+
 --------------------------------------------------------------------------
 """
 
 # directory: /Users/sritejpadmanabhan/Downloads/Research/Motor Learning Project/OpenMotor
 
+import argparse
+import functools
 import glob
+import json
 import os
-import pandas as pd
-
-# Ask user to input the folder path where all files are located
-folder_path = input("Please enter the path to the folder containing your files: ")
-
-# Ensure the path ends with a slash
-if not folder_path.endswith('/'):
-    folder_path += '/'
-
-''' Get all data files from the folder '''
-data_files = sorted(glob.glob(folder_path + '*data*.csv'))
-readme_files = sorted(glob.glob(folder_path + '*readme*.txt'))
-spreadsheet_files = sorted(glob.glob(folder_path + '*.xlsx'))
-
-# Check if required files were found
-if len(spreadsheet_files) == 0:
-    raise ValueError('No spreadsheet (.xlsx) file found in the folder.')
-if len(data_files) == 0:
-    raise ValueError('No data files found in the folder (looking for files with "data" in the name).')
-if len(readme_files) == 0:
-    raise ValueError('No readme files found in the folder (looking for files with "readme" in the name).')
-
-# Load the first spreadsheet found (assuming only one is required)
-T = pd.read_excel(spreadsheet_files[0])
-n_datasets = len(T)
-names_in_spreadsheet = sorted(list(T.Name_in_database))
-
-''' Determine if equal number of files are present in the spreadsheet, data, and readme '''
-num_names = len(names_in_spreadsheet)
-num_data = len(data_files)
-num_readme = len(readme_files)
-numList = [num_names, num_data, num_readme]
-
-print(f'# entries in spreadsheet: {num_names}')
-print(f'# data files: {num_data}')
-print(f'# readme files: {num_readme}')
-
-if not all([n == numList[0] for n in numList]):
-    raise ValueError('ERROR. Number of files doesn\'t match!\n')
-else:
-    print('OK: Number of files matches.\n')
-
+import sys
 
-''' Determine if all names match '''
-for dataset_num, data_file in enumerate(data_files):
-    spreadsheetname = names_in_spreadsheet[dataset_num]
-    datafilename = os.path.basename(data_file).split('.')[0][5:]  # Remove path and extract name
-    readmename = os.path.basename(readme_files[dataset_num]).split('.')[0][7:]  # Same for readme
-
-    match_spreadsheet_datafile = spreadsheetname == datafilename
-    match_spreadsheet_readme = spreadsheetname == readmename
-
-    if not(match_spreadsheet_datafile) or not(match_spreadsheet_readme):
-        print(f'Name in spreadsheet: {spreadsheetname}')
-        print(f'Name in data files: {datafilename}')
-        print(f'Name in readme files: {readmename}')
-        raise ValueError('ERROR. Name doesn\'t match!\n')
-
-print('OK: Names are consistent between the files and the spreadsheet.\n')
-
-
-''' Determine if data are loading well and if fields are named correctly '''
-print('\n-----Checking if the data are loading well and if data columns have correct names.------')
-
-pd.set_option('display.max_columns', 500)  # Force pandas to show 500 columns
-
-for dataset_num, datafile in enumerate(data_files):
-    # Load the dataset
-    dataframe = pd.read_csv(datafile)
-
-    # Display how the data is being read in
-    print(f'\nDataset name: {names_in_spreadsheet[dataset_num]}')
+from csv_ingest import read_csv, read_header
+from motor_schema import iter_data_csv, read_data_csv, required_columns
+from qc_trace import add_spans, run_traced, span, start_trace, stop_trace, tracing, write_trace
+
+# pandas and the modules built on it are imported by the functions that use them, so finding
+# the files of a submission and checking their names and headers never loads pandas
+
+
+# Data files larger than this are streamed in chunks instead of loaded whole
+stream_threshold_bytes = 1024 ** 3
+
+# Number of rows read at a time when streaming; bounds peak memory
+stream_chunk_rows = 500_000
+
+# Number of processes used to validate datasets; 1 validates them one after another
+num_workers = 1
+
+# Rows of every dataset shown for review
+preview_rows = 8
+
+
+def new_report(datafile, dataset_name, spreadsheet_row):
+    """ Start an empty report for one dataset """
+    return {
+        'name': dataset_name,
+        'datafile': datafile,
+        'num_rows': 0,
+        'preview': None,
+        'missing_columns': [],
+        'num_subjects': None,
+        'num_subjects_spreadsheet': int(spreadsheet_row.Num_subjects),
+        'min_trials': None,
+        'min_trials_spreadsheet': int(spreadsheet_row.Min_trials_per_subject),
+        'max_trials': None,
+        'max_trials_spreadsheet': int(spreadsheet_row.Max_trials_per_subject),
+        'rows_sorted': None,
+        'errors': [],
+    }
+
+
+def find_missing_columns(columns):
+    """ Required fields absent from the given columns, in schema order """
+    present = set(columns)
+    return [column for column in required_columns if column not in present]
+
+
+def check_headers(data_files):
+    """ Header-only check of every data file; maps each bad file to its missing fields """
+    missing_by_file = {}
+    for datafile in data_files:
+        missing = find_missing_columns(read_header(datafile))
+        if missing:
+            missing_by_file[datafile] = missing
+    return missing_by_file
+
+
+def check_columns(report, columns):
+    """ Record every required field that is missing from the dataset """
+    report['missing_columns'] = find_missing_columns(columns)
+    for column in report['missing_columns']:
+        report['errors'].append(f'ERROR. No field "{column}" exists. A field "{column}" MUST be present in the dataset.')
+
+
+def check_subjects_and_trials(report, summary):
+    """ Compare the number of subjects and trials per subject with the spreadsheet """
+    report['num_subjects'] = summary['num_subjects']
+    report['min_trials'] = summary['min_trials']
+    report['max_trials'] = summary['max_trials']
+
+    if report['num_subjects_spreadsheet'] != report['num_subjects']:
+        report['errors'].append('ERROR. Number of subjects doesn\'t match between spreadsheet and actual data.')
+    if report['min_trials_spreadsheet'] != report['min_trials']:
+        report['errors'].append('ERROR. The min total trials per subject doesn\'t match between spreadsheet and actual data.')
+    if report['max_trials_spreadsheet'] != report['max_trials']:
+        report['errors'].append('ERROR. The max total trials per subject doesn\'t match between spreadsheet and actual data.')
+
+
+def read_preview(datafile):
+    """ First preview_rows rows of a data file, as they are read in """
+    if find_missing_columns(read_header(datafile)):
+        return read_csv(datafile, nrows=preview_rows)
+    return read_data_csv(datafile, nrows=preview_rows)[0]
+
+
+def index_facts(facts, dataframe):
+    """ Index the rows by subject, then read the trials per subject and the trial order checks from the index """
+    from subject_stats import index_trial_counts, order_columns, rows_sorted, subject_index, trial_order_errors
+
+    with span('index_subjects') as record:
+        index = subject_index(dataframe)
+        facts['trial_counts'] = index_trial_counts(index)
+        record['rows'] = len(dataframe)
+    # Row order and trial order can only be checked once subject, block and trial numbers are numbers
+    if not set(['Subj_idx'] + order_columns) & set(facts['violations']):
+        facts['rows_sorted'] = rows_sorted(index)
+        with span('check_trial_order') as record:
+            facts['trial_order_errors'] = trial_order_errors(dataframe, index)
+            record['rows'] = len(dataframe)
+
+
+def read_dataset_facts(datafile, stream=None, chunk_rows=None, stream_threshold=None):
+    """
+    Read everything the checks need from a data file in one pass: the header, a preview,
+    the number of rows, dtype violations, the number of trials of every subject and
+    whether the trial numbers of every subject are in order.
+    Files larger than stream_threshold bytes (default stream_threshold_bytes), or all files with
+    stream=True, are read chunk_rows rows at a time, keeping one chunk and a running state per
+    subject in memory. Only subjects whose rows are out of block and trial order in the file
+    need a second read, which keeps the subject, block and trial of their rows.
+    """
+    from subject_stats import new_trial_state, order_columns, trial_state_counts, trial_state_errors, update_trial_state
+
+    if stream is None:
+        stream = os.path.getsize(datafile) > (stream_threshold_bytes if stream_threshold is None else stream_threshold)
+    chunk_rows = chunk_rows or stream_chunk_rows
+
+    facts = {'header': read_header(datafile), 'preview': None, 'num_rows': 0, 'violations': {}, 'trial_counts': None,
+             'rows_sorted': None, 'trial_order_errors': []}
+
+    # The header is checked before any rows are read
+    if find_missing_columns(facts['header']):
+        facts['preview'] = read_preview(datafile)
+        return facts
+
+    if not stream:
+        with span('parse', file=os.path.basename(datafile)) as record:
+            dataframe, facts['violations'] = read_data_csv(datafile)
+            record['rows'] = len(dataframe)
+        facts['preview'] = dataframe.head(preview_rows)
+        facts['num_rows'] = len(dataframe)
+        index_facts(facts, dataframe)
+        return facts
+
+    # Between chunks only the violations found so far and the running per-subject state are kept
+    state = new_trial_state()
+    with span('parse_chunked', file=os.path.basename(datafile), chunk_rows=chunk_rows) as record:
+        for chunk, chunk_violations in iter_data_csv(datafile, chunk_rows):
+            if facts['preview'] is None:
+                facts['preview'] = chunk.head(preview_rows)
+            facts['num_rows'] += len(chunk)
+            update_trial_state(state, chunk)
+            facts['violations'] = chunk_violations
+        record['rows'] = facts['num_rows']
+
+    facts['trial_counts'] = trial_state_counts(state)
+    # Row order and trial order can only be checked once subject, block and trial numbers are numbers
+    if not set(['Subj_idx'] + order_columns) & set(facts['violations']):
+        facts['rows_sorted'] = state['rows_sorted']
+        with span('check_trial_order', rechecked_subjects=len(state['unsorted_subjects'])) as record:
+            # Subjects whose rows aren't in block and trial order are read again, only their key columns
+            recheck_chunks = (chunk for chunk, _ in iter_data_csv(datafile, chunk_rows, usecols=['Subj_idx'] + order_columns))
+            facts['trial_order_errors'] = trial_state_errors(state, recheck_chunks)
+            record['rows'] = facts['num_rows']
+    return facts
+
+
+def check_dataset(facts, datafile, dataset_name, spreadsheet_row):
+    """ Run every check of one dataset against the facts read from its data file """
+    from subject_stats import summarize_trial_counts
+
+    report = new_report(datafile, dataset_name, spreadsheet_row)
+    report['num_rows'] = facts['num_rows']
+    report['preview'] = facts['preview']
+
+    with span('check_columns'):
+        check_columns(report, facts['header'])
+    if report['missing_columns']:
+        return report
+
+    # Values that don't fit the standardized dtype of their column
+    report['errors'].extend(facts['violations'].values())
+
+    # Missing subject ids would be counted as one more subject, and no output can index their trials
+    missing_subjects = facts['trial_counts'].index.isna()
+    if missing_subjects.any():
+        num_trials = int(facts['trial_counts'][missing_subjects].sum())
+        report['errors'].append(f'ERROR. Field "Subj_idx" is empty in {num_trials} trial(s). Every trial MUST belong to a subject.')
+
+    with span('check_subjects_and_trials'):
+        check_subjects_and_trials(report, summarize_trial_counts(facts['trial_counts']))
+    report['rows_sorted'] = facts['rows_sorted']
+    report['errors'].extend(facts['trial_order_errors'])
+    return report
+
+
+def validate_dataset(datafile, dataset_name, spreadsheet_row, cache_path=None, stream_threshold=None, chunk_rows=None):
+    """
+    Load a data file once and run every check against it, returning a report.
+    With a cache_path, facts of files that haven't changed since the last run are reused.
+    Files larger than stream_threshold bytes are read chunk_rows rows at a time.
+    """
+    read_facts = functools.partial(read_dataset_facts, chunk_rows=chunk_rows, stream_threshold=stream_threshold)
+    with span('dataset', dataset=dataset_name) as record:
+        if cache_path:
+            from validation_cache import cached_dataset_facts
+            with span('cache_lookup'):
+                facts = cached_dataset_facts(cache_path, datafile, read_facts)
+            if facts['preview'] is None:
+                facts['preview'] = read_preview(datafile)
+        else:
+            facts = read_facts(datafile)
+        record['rows'] = facts['num_rows']
+        return check_dataset(facts, datafile, dataset_name, spreadsheet_row)
+
+
+def validate_dataset_chunked(datafile, dataset_name, spreadsheet_row, chunk_rows=None):
+    """ Same checks as validate_dataset, streaming the file (see read_dataset_facts for what stays in memory) """
+    facts = read_dataset_facts(datafile, stream=True, chunk_rows=chunk_rows)
+    return check_dataset(facts, datafile, dataset_name, spreadsheet_row)
+
+
+def validate_datasets(data_files, dataset_names, spreadsheet_rows, workers=1, cache_path=None,
+                      stream_threshold=None, chunk_rows=None):
+    """ Validate each dataset, across a process pool when workers > 1; reports are yielded in file order """
+    rows = [spreadsheet_rows.loc[name] for name in dataset_names]
+    cache_paths = [cache_path] * len(data_files)
+    # Workers get the limits as arguments: with the spawn start method they don't see changes to the module settings
+    thresholds = [stream_threshold_bytes if stream_threshold is None else stream_threshold] * len(data_files)
+    chunk_sizes = [chunk_rows or stream_chunk_rows] * len(data_files)
+    if workers <= 1 or len(data_files) <= 1:
+        yield from map(validate_dataset, data_files, dataset_names, rows, cache_paths, thresholds, chunk_sizes)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(data_files)))
+    try:
+        if not tracing():
+            yield from executor.map(validate_dataset, data_files, dataset_names, rows, cache_paths, thresholds, chunk_sizes)
+            return
+        # Workers record their own spans, which are added to this trace
+        functions = [validate_dataset] * len(data_files)
+        for dataset_report, spans in executor.map(run_traced, functions, data_files, dataset_names, rows, cache_paths,
+                                                  thresholds, chunk_sizes):
+            add_spans(spans)
+            yield dataset_report
+    finally:
+        # Stop queued datasets if the caller stops at the first failing one
+        executor.shutdown(cancel_futures=True)
+
+
+def print_report(report):
+    """ Display how a dataset was read in and how it compares to the spreadsheet """
+    from data_preview import preview_model, window_text
+
+    print(f'\nDataset name: {report["name"]}')
     print('This is how the data from this dataset are being read in:')
-    print(dataframe.head(8))  # Show first 8 rows
+    # Same rows and cell text as the preview window; float32 values are shown as typed (216.47, not 216.470001)
+    print(window_text(preview_model(report['preview']), 0, preview_rows))  # Show the first rows
     print('Please check that columns that should be numeric are indeed numeric.')
-    print('If not, this most likely indicates a problem with the formatting of the data.')
-
-    # List of all expected columns
-    required_columns = [
-        'Subj_idx', 'trial_number', 'target_angle', 'feedback_type', 'rotation_angle',
-        'hand_angle', 'reaction_time', 'movement_time', 'search_time', 'screen_height',
-        'screen_width', 'repeat_number', 'researcher_id', 'condition', 'block_number',
-        'research_setting', 'input_device', 'subject_age', 'subject_sex', 'subject_race',
-        'neuro_condition', 'neuro_description', 'years_of_education', 'subject_vision',
-        'dominant_hand', 'device_type', 'mouse_type', 'feedback_time', 'initial_x', 
-        'initial_y', 'number_of_targets', 'target_type', 'target_height', 'target_width', 
-        'target_x', 'target_y', 'clamp_size', 'rotation_direction', 'hand_flip', 
-        'hand_base', 'hand_max_velocity', 'cognitive_assessment', 'cognitive_assessment_score'
+    print('If not, this most likely indicates a problem with the formatting of the data.\n')
+
+    if report['missing_columns']:
+        return
+
+    print(f'Number of subjects reported in spreadsheet: {report["num_subjects_spreadsheet"]}')
+    print(f'Number of actual subjects in data: {report["num_subjects"]}\n')
+    print(f'Min total trials per subject reported in spreadsheet: {report["min_trials_spreadsheet"]}')
+    print(f'Min total trials per subject in the actual data: {report["min_trials"]}\n')
+    print(f'Max total trials per subject reported in spreadsheet: {report["max_trials_spreadsheet"]}')
+    print(f'Max total trials per subject in the actual data: {report["max_trials"]}\n')
+
+
+def find_submission_files(folder_path):
+    """ Find the data, readme and spreadsheet files of a submission folder """
+    data_files = sorted(glob.glob(os.path.join(folder_path, '*data*.csv')))
+    readme_files = sorted(glob.glob(os.path.join(folder_path, '*readme*.txt')))
+    spreadsheet_files = sorted(glob.glob(os.path.join(folder_path, '*.xlsx')))
+
+    # Check if required files were found
+    if len(spreadsheet_files) == 0:
+        raise ValueError('No spreadsheet (.xlsx) file found in the folder.')
+    if len(data_files) == 0:
+        raise ValueError('No data files found in the folder (looking for files with "data" in the name).')
+    if len(readme_files) == 0:
+        raise ValueError('No readme files found in the folder (looking for files with "readme" in the name).')
+
+    return data_files, readme_files, spreadsheet_files
+
+
+def check_names(names_in_spreadsheet, data_files, readme_files, verbose=False):
+    """ Determine if the number of files and all names match between the spreadsheet, data and readme files """
+    num_names = len(names_in_spreadsheet)
+    num_data = len(data_files)
+    num_readme = len(readme_files)
+
+    if verbose:
+        print(f'# entries in spreadsheet: {num_names}')
+        print(f'# data files: {num_data}')
+        print(f'# readme files: {num_readme}')
+
+    if not (num_names == num_data == num_readme):
+        raise ValueError('ERROR. Number of files doesn\'t match!\n')
+    if verbose:
+        print('OK: Number of files matches.\n')
+
+    for dataset_num, data_file in enumerate(data_files):
+        spreadsheetname = names_in_spreadsheet[dataset_num]
+        datafilename = os.path.basename(data_file).split('.')[0][5:]  # Remove path and extract name
+        readmename = os.path.basename(readme_files[dataset_num]).split('.')[0][7:]  # Same for readme
+
+        if not (spreadsheetname == datafilename and spreadsheetname == readmename):
+            if verbose:
+                print(f'Name in spreadsheet: {spreadsheetname}')
+                print(f'Name in data files: {datafilename}')
+                print(f'Name in readme files: {readmename}')
+            raise ValueError('ERROR. Name doesn\'t match!\n')
+
+    if verbose:
+        print('OK: Names are consistent between the files and the spreadsheet.\n')
+
+
+def validate_submission(folder_path, workers=None, verbose=False, cache_path=None, stream_threshold=None, chunk_rows=None):
+    """
+    Run the full quality check on one submission folder without asking anything.
+    Returns a report dict; report['passed'] tells whether the submission is accepted
+    and report['error'] holds the reason when it is not. With a cache_path, files
+    that haven't changed since an earlier check aren't parsed again. Data files larger
+    than stream_threshold bytes are read chunk_rows rows at a time.
+    """
+    workers = workers or num_workers
+    report = {
+        'folder': folder_path,
+        'passed': False,
+        'error': None,
+        'num_datasets': 0,
+        'num_readme_files': 0,
+        'num_spreadsheet_files': 0,
+        'spreadsheet_file': None,
+        'num_subjects': 0,
+        'dataset_names': [],
+        'datasets': [],
+    }
+
+    try:
+        with span('discovery', folder=folder_path):
+            data_files, readme_files, spreadsheet_files = find_submission_files(folder_path)
+        report['num_datasets'] = len(data_files)
+        report['num_readme_files'] = len(readme_files)
+        report['num_spreadsheet_files'] = len(spreadsheet_files)
+
+        # Load the first spreadsheet found (assuming only one is required)
+        report['spreadsheet_file'] = spreadsheet_files[0]
+        with span('spreadsheet_load', cached=bool(cache_path)) as record:
+            if cache_path:
+                from validation_cache import cached_spreadsheet
+                T = cached_spreadsheet(cache_path, spreadsheet_files[0])
+            else:
+                import pandas as pd
+                T = pd.read_excel(spreadsheet_files[0])
+            record['rows'] = len(T)
+        names_in_spreadsheet = sorted(list(T.Name_in_database))
+        report['dataset_names'] = names_in_spreadsheet
+
+        with span('check_names'):
+            check_names(names_in_spreadsheet, data_files, readme_files, verbose)
+
+        # Determine if fields are named correctly, reading only the header of each data file
+        if verbose:
+            print('\n-----Checking if data columns have correct names.------')
+
+        with span('check_headers'):
+            missing_by_file = check_headers(data_files)
+        if missing_by_file:
+            if verbose:
+                for datafile, missing in missing_by_file.items():
+                    print(f'{os.path.basename(datafile)} is missing the fields: {", ".join(missing)}')
+            missing_list = '; '.join(f'{os.path.basename(datafile)}: {", ".join(missing)}'
+                                     for datafile, missing in missing_by_file.items())
+            raise ValueError(f'ERROR. Required fields are missing ({missing_list}). '
+                             'All of these fields MUST be present in the dataset.')
+
+        if verbose:
+            print('OK: All required fields are present in every data file.\n')
+
+        # Determine if data are loading well and if subjects and trials are reported correctly
+        if verbose:
+            print('\n-----Checking each dataset: data loading, column names, number of subjects and trials per subject.------')
+
+        # Spreadsheet rows looked up by dataset name, since the data files are sorted by name
+        spreadsheet_rows = T.set_index('Name_in_database')
+
+        # Each dataset is loaded once and every check runs against that one load
+        for dataset_report in validate_datasets(data_files, names_in_spreadsheet, spreadsheet_rows, workers, cache_path,
+                                                stream_threshold, chunk_rows):
+            report['datasets'].append(dataset_report)
+            if verbose:
+                print_report(dataset_report)
+            if dataset_report['errors']:
+                raise ValueError(dataset_report['errors'][0])
+
+    except ValueError as e:
+        report['error'] = str(e)
+        return report
+    except Exception as e:
+        # Anything else (a malformed spreadsheet, an unreadable file) fails this submission only
+        report['error'] = f'ERROR. The submission could not be checked ({type(e).__name__}: {e}).'
+        return report
+
+    report['num_subjects'] = sum([dataset_report['num_subjects'] for dataset_report in report['datasets']])
+    report['passed'] = True
+    return report
+
+
+def report_to_json(report):
+    """ JSON-serializable copy of a submission report (dataset previews are left out) """
+    json_report = dict(report)
+    json_report['datasets'] = [
+        {key: value for key, value in dataset_report.items() if key != 'preview'}
+        for dataset_report in report['datasets']
     ]
+    return json_report
 
-    # Check if all required fields are present and give warnings if not
-    for column in required_columns:
-        if column not in dataframe.keys():
-            raise ValueError(f'ERROR. No field "{column}" exists. A field "{column}" MUST be present in the dataset.')
-
-print('')
-
-''' Determine if number of subjects are reported correctly in spreadsheet '''
-print('\n-----Checking if reported number of subjects is correct.------')
-for dataset_num, datafile in enumerate(data_files):
-    # Load the dataset
-    dataframe = pd.read_csv(datafile)
-
-    # Get number of subjects from different sources
-    numsubj_spreadsheet = T.Num_subjects[dataset_num]
-    numsubj_datafile = len(set(dataframe.Subj_idx))
-
-    # Display basic info
-    print(f'Dataset name: {names_in_spreadsheet[dataset_num]}')
-    print(f'Number of subjects reported in spreadsheet: {numsubj_spreadsheet}')
-    print(f'Number of actual subjects in data: {numsubj_datafile}\n')
-
-    # Check for inconsistency in number of subjects
-    if numsubj_spreadsheet != numsubj_datafile:
-        raise ValueError('ERROR. Number of subjects doesn\'t match between spreadsheet and actual data.')
-
-
-''' Determine if number of trials per subject are reported correctly in spreadsheet '''
-print('\n-----Checking if reported number of trials per subject is correct.------')
-for dataset_num, datafile in enumerate(data_files):
-    # Load the dataset
-    dataframe = pd.read_csv(datafile)
-
-    # Determine the number of trials per subject
-    subject_names = sorted(list(set(dataframe.Subj_idx)))
-    trials_per_subj = [
-            len(dataframe.trial_number[dataframe.Subj_idx == subjname]) for subjname in subject_names]
-
-    # Display basic info
-    print(f'Dataset name: {names_in_spreadsheet[dataset_num]}')
-    print(f'Min total trials per subject reported in spreadsheet: {T.Min_trials_per_subject[dataset_num]}')
-    print(f'Min total trials per subject in the actual data: {min(trials_per_subj)}\n')
-    print(f'Max total trials per subject reported in spreadsheet: {T.Max_trials_per_subject[dataset_num]}')
-    print(f'Max total trials per subject in the actual data: {max(trials_per_subj)}\n')
-
-    # Check for inconsistency in number of trials per subject
-    if T.Min_trials_per_subject[dataset_num] != min(trials_per_subj):
-        raise ValueError('ERROR. The min total trials per subject doesn\'t match between spreadsheet and actual data.')
-    if T.Max_trials_per_subject[dataset_num] != max(trials_per_subj):
-        raise ValueError('ERROR. The max total trials per subject doesn\'t match between spreadsheet and actual data.')
-    
 
 def write_confirmation_file(message, output_file):
     """ Write the confirmation or error message to a text file """
     with open(output_file, 'w') as file:
         file.write(message)
-    print(f"File '{output_file}' has been created. You can download it from your folder.")
+    print(f"File '{output_file}' has been created. You can download it from your folder.", file=sys.stderr)  # Keeps --json - clean
 
-def create_error_message(error_info):
-    """ Create the content for the error message """
-    message = f"ERROR encountered during quality check: {error_info}\n"
-    message += "Please review the following guidelines to fix the issue:\n"
-    message += "1. Ensure the data, readme, and spreadsheet files match in number and names.\n"
-    message += "2. Check that all required fields are present in the dataset.\n"
-    message += "3. Make sure the number of subjects and trials per subject match the spreadsheet report.\n"
-    return message
-    
-
-def create_success_message(num_datasets, num_subjects, dataset_names):
-    """ Create a success message with detailed information """
-    message = "Congratulations! Your data passed the quality check.\n"
-    message += "Please attach this confirmation message to your submission.\n"
-    message += "\nBelow is a summary of your submission:\n"
-    message += f"- Number of datasets: {num_datasets}\n"
-    message += f"- Total number of subjects: {num_subjects}\n"
-    message += f"- Dataset names: {', '.join(dataset_names)}\n"
-    message += "\nPlease confirm that the information above is correct. If anything seems wrong, please make corrections before submitting.\n"
-    return message
-
-
-def write_confirmation_file(message, output_file):
-    """ Write the confirmation or error message to a text file """
-    with open(output_file, 'w') as file:
-        file.write(message)
-    print(f"File '{output_file}' has been created. You can download it from your folder.")
 
 def create_error_message(error_info):
     """ Create the content for the error message """
@@ -204,92 +462,143 @@ def create_error_message(error_info):
     message += "3. Make sure the number of subjects and trials per subject match the spreadsheet report.\n"
     return message
 
-def create_success_message(num_datasets, num_subjects, dataset_names):
-    """ Create a success message with detailed information """
+
+def create_success_message(report):
+    """ Create a success message with detailed information about a submission report """
     message = "Congratulations! Your data passed the quality check.\n"
     message += "Please attach this confirmation message to your submission.\n"
     message += "\nBelow is a summary of your submission:\n"
-    message += f"- Number of datasets: {num_datasets}\n"
-    message += f"- Total number of subjects: {num_subjects}\n"
-    message += f"- Dataset names: {', '.join(dataset_names)}\n"
+    message += f"- Number of datasets: {report['num_datasets']}\n"
+    message += f"- Number of readme files: {report['num_readme_files']}\n"
+    message += f"- Number of spreadsheet files: {report['num_spreadsheet_files']}\n"
+    message += f"- Total number of subjects: {report['num_subjects']}\n"
+    message += f"- Dataset names: {', '.join(report['dataset_names'])}\n"
     message += "\nPlease confirm that the information above is correct. If anything seems wrong, please make corrections before submitting.\n"
     return message
 
-# Get all data files from the folder
-data_files = sorted(glob.glob(folder_path + '*data*.csv'))
-readme_files = sorted(glob.glob(folder_path + '*readme*.txt'))
-spreadsheet_files = sorted(glob.glob(folder_path + '*.xlsx'))
-
-# Check if required files were found
-if len(spreadsheet_files) == 0:
-    error_message = 'No spreadsheet (.xlsx) file found in the folder.'
-    write_confirmation_file(create_error_message(error_message), folder_path + "Error_Message.txt")
-    raise ValueError(error_message)
-
-if len(data_files) == 0:
-    error_message = 'No data files found in the folder (looking for files with "data" in the name).'
-    write_confirmation_file(create_error_message(error_message), folder_path + "Error_Message.txt")
-    raise ValueError(error_message)
-
-if len(readme_files) == 0:
-    error_message = 'No readme files found in the folder (looking for files with "readme" in the name).'
-    write_confirmation_file(create_error_message(error_message), folder_path + "Error_Message.txt")
-    raise ValueError(error_message)
-
-# Load the first spreadsheet found (assuming only one is required)
-T = pd.read_excel(spreadsheet_files[0])
-n_datasets = len(T)
-names_in_spreadsheet = sorted(list(T.Name_in_database))
-
-# Check if the number of datasets, data files, and readme files match
-num_names = len(names_in_spreadsheet)
-num_data = len(data_files)
-num_readme = len(readme_files)
-
-if not all([n == num_names for n in [num_data, num_readme]]):
-    raise ValueError('ERROR. Number of files doesn\'t match!\n')
-
-# Check if names match between the spreadsheet, data files, and readme files
-for dataset_num, data_file in enumerate(data_files):
-    spreadsheetname = names_in_spreadsheet[dataset_num]
-    datafilename = os.path.basename(data_file).split('.')[0][5:]  # Remove path and extract name
-    readmename = os.path.basename(readme_files[dataset_num]).split('.')[0][7:]  # Same for readme
-
-    if not(spreadsheetname == datafilename and spreadsheetname == readmename):
-        raise ValueError(f'ERROR. Name doesn\'t match for dataset {spreadsheetname}!\n')
-
-# Gather detailed information for the confirmation message
-num_datasets = len(data_files)
-num_subjects = sum([len(set(pd.read_csv(datafile).Subj_idx)) for datafile in data_files])
-dataset_names = names_in_spreadsheet
-# Gather detailed information for the confirmation message
-num_datasets = len(data_files)
-num_subjects = sum([len(set(pd.read_csv(datafile).Subj_idx)) for datafile in data_files])
-dataset_names = names_in_spreadsheet
-num_readme_files = len(readme_files)
-num_spreadsheet_files = len(spreadsheet_files)
-
-# Create the success confirmation message including all relevant details
-success_message = "Congratulations! Your data passed the quality check.\n"
-success_message += "Please attach this confirmation message to your submission.\n"
-success_message += "\nBelow is a summary of your submission:\n"
-success_message += f"- Number of datasets: {num_datasets}\n"
-success_message += f"- Number of readme files: {num_readme_files}\n"
-success_message += f"- Number of spreadsheet files: {num_spreadsheet_files}\n"
-success_message += f"- Total number of subjects: {num_subjects}\n"
-success_message += f"- Dataset names: {', '.join(dataset_names)}\n"
-success_message += "\nPlease confirm that the information above is correct. If anything seems wrong, please make corrections before submitting.\n"
-
-# Display the summary information to the user
-print("\nHere is a summary of your submission:")
-print(success_message)
-
-# Ask the user for confirmation before creating the text file
-confirm = input("Does the information look correct? (yes/no): ").strip().lower()
-
-# If the user confirms, write the success message to a text file
-if confirm == 'yes':
-    write_confirmation_file(success_message, folder_path + "Confirmation_Message.txt")
-    print(f"Confirmation message saved as 'Confirmation_Message.txt' in {folder_path}.")
-else:
-    print("Please review your data and make the necessary changes before proceeding.")
+
+def write_report_message(report):
+    """ Write Confirmation_Message.txt or Error_Message.txt into the submission folder """
+    with span('write_report'):
+        if report['passed']:
+            write_confirmation_file(create_success_message(report), os.path.join(report['folder'], "Confirmation_Message.txt"))
+        else:
+            write_confirmation_file(create_error_message(report['error']), os.path.join(report['folder'], "Error_Message.txt"))
+
+
+def write_outputs(report, store_path=None, database_path=None, column_cache_path=None, stream_threshold=None, chunk_rows=None):
+    """
+    Write the datasets of a passing submission to the requested store, database and column cache.
+    A failing write fails this submission only: the report gets passed=False and the reason.
+    """
+    from motor_outputs import write_submission
+
+    try:
+        # Each data file is read once for all the outputs
+        with span('outputs', folder=report['folder']):
+            write_submission(report, store_path, database_path, column_cache_path,
+                             stream_threshold_bytes=stream_threshold_bytes if stream_threshold is None else stream_threshold,
+                             chunk_rows=chunk_rows or stream_chunk_rows)
+    except Exception as e:
+        report['passed'] = False
+        report['error'] = f'ERROR. The submission passed the quality check but could not be saved ({type(e).__name__}: {e}).'
+
+
+def run_interactive():
+    """ Ask for a folder, check it and ask for confirmation before writing the confirmation file """
+    # Ask user to input the folder path where all files are located
+    folder_path = input("Please enter the path to the folder containing your files: ")
+
+    import pandas as pd
+    pd.set_option('display.max_columns', 500)  # Force pandas to show 500 columns
+
+    report = validate_submission(folder_path, verbose=True)
+    if not report['passed']:
+        write_report_message(report)
+        raise ValueError(report['error'])
+    print('')
+
+    # Display the summary information to the user
+    success_message = create_success_message(report)
+    print("\nHere is a summary of your submission:")
+    print(success_message)
+
+    # Ask the user for confirmation before creating the text file
+    confirm = input("Does the information look correct? (yes/no): ").strip().lower()
+
+    # If the user confirms, write the success message to a text file
+    if confirm == 'yes':
+        write_report_message(report)
+        print(f"Confirmation message saved as 'Confirmation_Message.txt' in {folder_path}.")
+    else:
+        print("Please review your data and make the necessary changes before proceeding.")
+
+
+def main(argv=None):
+    """ Check the submission folders given on the command line, or ask for one when none are given """
+    parser = argparse.ArgumentParser(description='Quality check for contributions to the Motor Learning Dataset.')
+    parser.add_argument('folders', nargs='*', help='submission folders to check; asks for one interactively if omitted')
+    parser.add_argument('--workers', type=int, default=num_workers, help='processes used to validate the datasets of a submission')
+    parser.add_argument('--json', metavar='PATH', help='write the reports as JSON to PATH ("-" for standard output)')
+    parser.add_argument('--write-messages', action='store_true',
+                        help='write Confirmation_Message.txt or Error_Message.txt into each folder')
+    parser.add_argument('--cache', metavar='PATH', help='reuse the results of unchanged files from this cache file')
+    parser.add_argument('--store', metavar='PATH', help='write the datasets of passing submissions to this Parquet store')
+    parser.add_argument('--database', metavar='PATH', help='add the datasets of passing submissions to this SQLite database')
+    parser.add_argument('--column-cache', metavar='PATH',
+                        help='write the numeric trial columns of passing submissions to this memory-mapped cache')
+    parser.add_argument('--stream-threshold', metavar='BYTES', type=int, default=stream_threshold_bytes,
+                        help='read data files larger than this in chunks instead of whole')
+    parser.add_argument('--chunk-rows', metavar='N', type=int, default=stream_chunk_rows,
+                        help='rows read at a time from a file read in chunks; bounds peak memory')
+    parser.add_argument('--trace', metavar='PATH', help='write the time and peak memory of every stage of the check to PATH')
+    parser.add_argument('--trace-format', choices=['json', 'chrome'], default='json',
+                        help='format of the trace: plain JSON, or Chrome trace events for chrome://tracing and Perfetto')
+    args = parser.parse_args(argv)
+    if args.chunk_rows < 1 or args.stream_threshold < 0:
+        parser.error('--chunk-rows must be at least 1 and --stream-threshold can\'t be negative')
+
+    if not args.folders:
+        run_interactive()
+        return 0
+
+    if args.trace:
+        start_trace()
+
+    reports = []
+    for folder_path in args.folders:
+        report = validate_submission(folder_path, workers=args.workers, cache_path=args.cache,
+                                     stream_threshold=args.stream_threshold, chunk_rows=args.chunk_rows)
+        if report['passed'] and (args.store or args.database or args.column_cache):
+            write_outputs(report, args.store, args.database, args.column_cache, args.stream_threshold, args.chunk_rows)
+        reports.append(report)
+        if args.json != '-':
+            if report['passed']:
+                print(f'PASSED: {folder_path}')
+            else:
+                print(f'FAILED: {folder_path} ({report["error"].strip()})')
+        if args.write_messages:
+            write_report_message(report)
+
+    if args.cache:
+        from validation_cache import evict_cache
+        evict_cache(args.cache)
+
+    if args.json:
+        with span('write_json'):
+            json_reports = [report_to_json(report) for report in reports]
+            if args.json == '-':
+                json.dump(json_reports, sys.stdout, indent=2)
+                print('')
+            else:
+                with open(args.json, 'w') as file:
+                    json.dump(json_reports, file, indent=2)
+
+    if args.trace:
+        write_trace(stop_trace(), args.trace, args.trace_format)
+
+    return 0 if all(report['passed'] for report in reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Stage timing and memory trace of the quality check
+
+ Every stage of the check (discovery, spreadsheet load, parsing each
+ dataset, each check, writing the report) runs inside a named span. While
+ a trace is being recorded, each span records its start, duration, rows
+ processed and the peak memory of the process when it ends. When no trace
+ is being recorded a span does nothing, so the check pays close to nothing.
+
+ Datasets checked in worker processes are traced there and their spans are
+ added to the trace of the main process.
+
+ Usage:
+    python open_motor.py folder --trace trace.json [--trace-format chrome]
+
+    start_trace()
+    report = validate_submission(folder)
+    write_trace(stop_trace(), 'trace.json')
+
+ The chrome format opens in chrome://tracing or https://ui.perfetto.dev.
+
+--------------------------------------------------------------------------
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; spans then record no memory
+    resource = None
+
+
+# Spans of the trace being recorded, or None when tracing is off
+active_trace = None
+
+# Start of the trace being recorded (perf_counter seconds; the clock is shared by all processes)
+trace_start = None
+
+# Depth of the spans currently open in this process
+open_spans = 0
+
+
+def peak_memory_mb():
+    """ Peak resident memory of this process so far, in MB (None where it can't be measured) """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, kilobytes on Linux
+
+
+def start_trace():
+    """ Start recording spans """
+    global active_trace, trace_start, open_spans
+    active_trace = []
+    trace_start = time.perf_counter()
+    open_spans = 0
+
+
+def stop_trace():
+    """ Stop recording and return the recorded spans """
+    global active_trace
+    spans, active_trace = active_trace or [], None
+    return spans
+
+
+def tracing():
+    """ True while a trace is being recorded """
+    return active_trace is not None
+
+
+@contextlib.contextmanager
+def recorded_span(name, args):
+    """ Record one span into the active trace """
+    global open_spans
+    record = {'name': name, 'args': args, 'rows': None}
+    start = time.perf_counter()
+    open_spans += 1
+    try:
+        yield record
+    finally:
+        open_spans -= 1
+        record.update({
+            'start': start,
+            'seconds': time.perf_counter() - start,
+            'depth': open_spans,
+            'peak_rss_mb': peak_memory_mb(),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        })
+        active_trace.append(record)
+
+
+def span(name, **args):
+    """
+    Context manager around one stage. Set record['rows'] to the rows it processed:
+        with span('parse', dataset=name) as record:
+            ...
+            record['rows'] = len(dataframe)
+    """
+    if active_trace is None:
+        return contextlib.nullcontext({})
+    return recorded_span(name, args)
+
+
+def run_traced(function, *args):
+    """ Run a function with a trace of its own (in a worker process); returns (result, spans) """
+    start_trace()
+    try:
+        result = function(*args)
+    finally:
+        spans = stop_trace()
+    return result, spans
+
+
+def add_spans(spans):
+    """ Add spans recorded elsewhere (by run_traced in a worker) to the active trace """
+    if active_trace is not None:
+        active_trace.extend(spans)
+
+
+def trace_to_json(spans):
+    """ Spans with start times relative to the start of the trace, ordered by start """
+    origin = trace_start if trace_start is not None else min((record['start'] for record in spans), default=0)
+    return {'spans': [dict(record, start=record['start'] - origin) for record in sorted(spans, key=lambda record: record['start'])]}
+
+
+def trace_to_chrome(spans):
+    """ Spans as Chrome trace events (complete events, times in microseconds) """
+    events = []
+    for record in trace_to_json(spans)['spans']:
+        args = dict(record['args'], rows=record['rows'], peak_rss_mb=record['peak_rss_mb'])
+        events.append({
+            'name': record['name'],
+            'ph': 'X',
+            'ts': round(record['start'] * 1e6, 1),
+            'dur': round(record['seconds'] * 1e6, 1),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': args,
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_trace(spans, path, trace_format='json'):
+    """ Write spans as JSON ('json') or in Chrome trace-event format ('chrome') """
+    if trace_format not in ('json', 'chrome'):
+        raise ValueError(f'ERROR. Unknown trace format {trace_format!r}; use json or chrome.')
+    trace = trace_to_chrome(spans) if trace_format == 'chrome' else trace_to_json(spans)
+    with open(path, 'w') as file:
+        json.dump(trace, file, indent=2, default=str)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Per-subject summaries for standardized Motor Learning datasets
+
+ A subject index orders the rows by subject, block and trial and records
+ where each subject starts and ends, so the trials of one subject are a
+ slice, the number of trials per subject is a difference of offsets, and the
+ order of trial numbers within every subject is checked in one vectorized pass.
+
+ Files read in chunks are checked from a running state instead (trials per
+ subject and the last block and trial of every subject), so memory stays
+ bounded by the chunk size and the number of subjects.
+
+ Usage:
+    from subject_stats import subject_index, subject_summary
+    index = subject_index(dataframe)
+    rows = index['order'][subject_rows(index, 3)]   # positions of subject 3's trials
+    summary = subject_summary(dataframe)
+    summary['num_subjects'], summary['min_trials'], summary['max_trials']
+
+--------------------------------------------------------------------------
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Columns the rows of every subject are ordered by
+order_columns = ['block_number', 'trial_number']
+
+# Subjects named in a trial order error before the rest are only counted
+max_subjects_listed = 5
+
+
+def subject_index(dataframe, subject_column='Subj_idx', order_columns=order_columns):
+    """
+    Index of a dataframe by subject: a dict with
+        order    - row positions sorted by subject, then by order_columns
+        subjects - the subjects in sorted order (missing ids together as the last one)
+        offsets  - the sorted rows of subjects[i] are order[offsets[i]:offsets[i + 1]]
+    """
+    # Factorizing gives sortable integer codes for any dtype, with missing values last
+    codes, subjects = pd.factorize(dataframe[subject_column], sort=True, use_na_sentinel=False)
+    keys = [pd.factorize(dataframe[column], sort=True, use_na_sentinel=False)[0]
+            for column in reversed(order_columns) if column in dataframe.columns]
+    order = np.lexsort(keys + [codes]) if keys else np.argsort(codes, kind='stable')
+
+    counts = np.bincount(codes, minlength=len(subjects))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+    return {'order': order, 'subjects': subjects, 'offsets': offsets}
+
+
+def subject_rows(index, position):
+    """ Slice of index['order'] holding the rows of the subject at the given position """
+    return slice(int(index['offsets'][position]), int(index['offsets'][position + 1]))
+
+
+def index_trial_counts(index):
+    """ Number of trials (rows) for every subject, read from the index offsets """
+    return pd.Series(np.diff(index['offsets']), index=index['subjects'], name='num_trials')
+
+
+def trials_per_subject(dataframe, subject_column='Subj_idx'):
+    """ Number of trials (rows) for every subject, indexed by subject """
+    # Missing subject ids are kept together as one subject, like the set() they replace
+    return index_trial_counts(subject_index(dataframe, subject_column, order_columns=[]))
+
+
+def rows_sorted(index):
+    """ True if the rows are already in subject, block and trial order """
+    return bool((np.diff(index['order']) > 0).all())
+
+
+def list_subjects(subjects):
+    """ Subject ids for an error message, the first few named and the rest counted """
+    named = ', '.join(str(subject) for subject in subjects[:max_subjects_listed])
+    if len(subjects) > max_subjects_listed:
+        named += f' and {len(subjects) - max_subjects_listed} more'
+    return named
+
+
+# Ways the trial numbers of a subject can break the order, and what the error says about them
+trial_order_rules = {
+    'repeat': 'repeat within subject(s) {}. Every trial of a subject MUST have its own trial number.',
+    'skip': 'skip values within subject(s) {}. The trial numbers of a subject MUST be consecutive.',
+    'down': 'go down from one block to the next within subject(s) {}. Trial numbers MUST increase with block_number.',
+}
+
+
+def trial_order_breaks(dataframe, index, trial_column='trial_number'):
+    """
+    Subjects whose trial numbers, in block and trial order, don't count up by one, by rule:
+    repeated trial numbers, gaps, and trial numbers going down from one block to the next
+    """
+    trials = pd.to_numeric(dataframe[trial_column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    steps = np.diff(trials[index['order']])
+
+    # Steps from the last trial of one subject to the first trial of the next don't count
+    within_subject = np.ones(len(steps), dtype=bool)
+    within_subject[index['offsets'][1:-1] - 1] = False
+    step_subjects = np.searchsorted(index['offsets'], np.arange(len(steps)), side='right') - 1
+
+    breaks = {}
+    for rule, broken in zip(trial_order_rules, [steps == 0, steps > 1, steps < 0]):
+        broken &= within_subject
+        breaks[rule] = list(index['subjects'][np.unique(step_subjects[broken])])
+    return breaks
+
+
+def trial_order_messages(breaks, trial_column='trial_number'):
+    """ Error messages for the subjects found by trial_order_breaks (or the streamed check) """
+    return [f'ERROR. Values of field "{trial_column}" ' + trial_order_rules[rule].format(list_subjects(subjects))
+            for rule, subjects in breaks.items() if len(subjects)]
+
+
+def trial_order_errors(dataframe, index, trial_column='trial_number'):
+    """
+    Check that the trial numbers of every subject, in block and trial order, count up by one:
+    no repeated trial numbers, no gaps, and no trial numbers going down from one block to the next
+    """
+    return trial_order_messages(trial_order_breaks(dataframe, index, trial_column), trial_column)
+
+
+def order_keys(dataframe, subject_column='Subj_idx'):
+    """ Subject, block and trial of every row as float arrays, missing values as +inf so they sort last """
+    keys = []
+    for column in [subject_column] + order_columns:
+        values = pd.to_numeric(dataframe[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        keys.append(np.where(np.isnan(values), np.inf, values))
+    return keys
+
+
+def subject_label(key):
+    """ Subject id of an order key, as subject_index lists it """
+    return pd.NA if np.isinf(key) else int(key) if float(key).is_integer() else key
+
+
+def new_trial_state():
+    """
+    Running state of the per-subject checks of a file read in chunks: trials per subject, the
+    last (block, trial) of every subject, and the subjects breaking each trial order rule so far
+    """
+    return {
+        'counts': None,
+        'last_row': None,
+        'rows_sorted': True,
+        'last_trial': {},
+        'unsorted_subjects': set(),
+        'breaks': {rule: set() for rule in trial_order_rules},
+    }
+
+
+def update_trial_state(state, chunk, subject_column='Subj_idx'):
+    """
+    Add one chunk to the running state. Each row is compared with the previous row of its
+    subject, which gives the same steps as the sorted check as long as every subject's rows
+    come in block and trial order; subjects whose rows don't are set aside in unsorted_subjects.
+    """
+    counts = chunk[subject_column].value_counts(dropna=False)
+    state['counts'] = counts if state['counts'] is None else state['counts'].add(counts, fill_value=0)
+    if not len(chunk):
+        return
+
+    # Is the whole file in subject, block and trial order?
+    keys = order_keys(chunk, subject_column)
+    last_row = state['last_row'] or [key[0] for key in keys]
+    previous = [np.concatenate([[last], values[:-1]]) for last, values in zip(last_row, keys)]
+    (subjects, blocks, trials), (last_subjects, last_blocks, last_trials) = keys, previous
+    goes_back = (subjects < last_subjects) | ((subjects == last_subjects) & (
+        (blocks < last_blocks) | ((blocks == last_blocks) & (trials < last_trials))))
+    state['rows_sorted'] = state['rows_sorted'] and not goes_back.any()
+    state['last_row'] = [key[-1] for key in keys]
+
+    # The rows of every subject, in file order, each with the row before it
+    order = np.argsort(subjects, kind='stable')
+    subjects, blocks, trials = subjects[order], blocks[order], trials[order]
+    first = np.ones(len(subjects), dtype=bool)
+    first[1:] = subjects[1:] != subjects[:-1]
+    previous_blocks = np.concatenate([[np.inf], blocks[:-1]])
+    previous_trials = np.concatenate([[np.inf], trials[:-1]])
+    has_previous = ~first
+    starts = np.flatnonzero(first)
+    for position in starts:
+        if subjects[position] in state['last_trial']:
+            previous_blocks[position], previous_trials[position] = state['last_trial'][subjects[position]]
+            has_previous[position] = True
+    for position in np.append(starts[1:] - 1, len(subjects) - 1):
+        state['last_trial'][subjects[position]] = (blocks[position], trials[position])
+
+    out_of_order = has_previous & ((blocks < previous_blocks) | ((blocks == previous_blocks) & (trials < previous_trials)))
+    state['unsorted_subjects'].update(np.unique(subjects[out_of_order]).tolist())
+
+    # Missing trial numbers (inf) give no step, as in the sorted check
+    with np.errstate(invalid='ignore'):
+        steps = np.where(np.isinf(trials) | np.isinf(previous_trials), np.nan, trials - previous_trials)
+    checked = has_previous & ~out_of_order
+    for rule, broken in zip(trial_order_rules, [steps == 0, steps > 1, steps < 0]):
+        state['breaks'][rule].update(np.unique(subjects[checked & broken]).tolist())
+
+
+def trial_state_counts(state):
+    """ Number of trials (rows) for every subject from the running state """
+    if state['counts'] is None:
+        return pd.Series([], dtype='int64', name='num_trials')
+    return state['counts'].sort_index(na_position='last').astype('int64').rename('num_trials').rename_axis(None)
+
+
+def trial_state_errors(state, recheck_chunks, subject_column='Subj_idx', trial_column='trial_number'):
+    """
+    Trial order errors from the running state. Subjects whose rows weren't in block and trial
+    order are checked again from recheck_chunks (chunks of the same file, read only if there are
+    such subjects); only their rows are kept, so a file in order never holds more than a chunk.
+    """
+    breaks = {rule: subjects - state['unsorted_subjects'] for rule, subjects in state['breaks'].items()}
+    if state['unsorted_subjects']:
+        unsorted = np.array(sorted(state['unsorted_subjects']))
+        rows = [chunk[np.isin(order_keys(chunk, subject_column)[0], unsorted)] for chunk in recheck_chunks]
+        rows = pd.concat(rows, ignore_index=True)
+        for rule, subjects in trial_order_breaks(rows, subject_index(rows), trial_column).items():
+            breaks[rule].update(np.inf if pd.isna(subject) else float(subject) for subject in subjects)
+    return trial_order_messages({rule: [subject_label(key) for key in sorted(subjects)] for rule, subjects in breaks.items()},
+                                trial_column)
+
+
+def summarize_trial_counts(counts):
+    """ Subject count and min/max trials per subject from per-subject trial counts """
+    return {
+        'num_subjects': len(counts),
+        'min_trials': int(counts.min()) if len(counts) else 0,
+        'max_trials': int(counts.max()) if len(counts) else 0,
+        'trials_per_subject': counts,
+    }
+
+
+def subject_summary(dataframe, subject_column='Subj_idx'):
+    """ Per-subject trial counts, number of subjects and min/max trials """
+    return summarize_trial_counts(trials_per_subject(dataframe, subject_column))
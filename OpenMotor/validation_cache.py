@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Validation cache for the quality check
+
+ Keeps what the checks learned from each data file (header, number of rows,
+ dtype violations, trials of every subject) and the rows of each spreadsheet
+ in a small SQLite file, keyed by a hash of the file contents. A file whose
+ size and modification time are unchanged isn't even re-hashed, and a file
+ whose contents are unchanged is never parsed again.
+
+ Entries unused for cache_max_age_days are dropped, then the least recently
+ used ones until the cache holds at most cache_max_bytes of facts.
+
+ Usage:
+    python open_motor.py folder1 folder2 --cache qc_cache.db
+
+--------------------------------------------------------------------------
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from motor_schema import column_dtypes
+
+
+# Eviction limits
+cache_max_age_days = 30
+cache_max_bytes = 256 * 1024 ** 2
+
+# Bytes read at a time while hashing a file
+hash_block_bytes = 1024 ** 2
+
+# Version of the facts kept for a data file; bump it when read_dataset_facts learns something new
+facts_version = 4
+
+# Facts depend on the schema, so a schema change invalidates them
+schema_version = hashlib.sha1(json.dumps([facts_version, column_dtypes], sort_keys=True).encode()).hexdigest()[:12]
+
+
+def connect(cache_path):
+    """ Open the cache, creating its tables if needed """
+    connection = sqlite3.connect(cache_path, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('CREATE TABLE IF NOT EXISTS files '
+                       '(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)')
+    connection.execute('CREATE TABLE IF NOT EXISTS facts '
+                       '(key TEXT PRIMARY KEY, facts TEXT, num_bytes INTEGER, last_used REAL)')
+    return connection
+
+
+def hash_file(path):
+    """ Hash of the contents of a file """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(hash_block_bytes), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_hash(connection, path):
+    """ Content hash of a file, re-hashing it only if its size or modification time changed """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    row = connection.execute('SELECT size, mtime_ns, hash FROM files WHERE path = ?', (path,)).fetchone()
+    if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+        return row[2]
+
+    content_hash = hash_file(path)
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                           (path, stat.st_size, stat.st_mtime_ns, content_hash))
+    return content_hash
+
+
+def cached(cache_path, path, kind, compute, encode, decode):
+    """ Facts of kind about a file, from the cache when its contents are unchanged, otherwise computed and stored """
+    connection = connect(cache_path)
+    try:
+        key = f'{kind}:{schema_version}:{file_hash(connection, path)}'
+        row = connection.execute('SELECT facts FROM facts WHERE key = ?', (key,)).fetchone()
+        if row:
+            with connection:
+                connection.execute('UPDATE facts SET last_used = ? WHERE key = ?', (time.time(), key))
+            return decode(row[0])
+
+        facts = compute(path)
+        text = encode(facts)
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?)', (key, text, len(text), time.time()))
+        return facts
+    finally:
+        connection.close()
+
+
+def json_value(value):
+    """ Plain Python form of a subject id (numpy scalars aren't JSON serializable) """
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def encode_dataset_facts(facts):
+    """ Facts of a data file as JSON (the preview isn't kept) """
+    trial_counts = None
+    if facts['trial_counts'] is not None:
+        trial_counts = [[json_value(subject), int(count)] for subject, count in facts['trial_counts'].items()]
+    return json.dumps({
+        'header': facts['header'],
+        'num_rows': facts['num_rows'],
+        'violations': facts['violations'],
+        'trial_counts': trial_counts,
+        'rows_sorted': facts['rows_sorted'],
+        'trial_order_errors': facts['trial_order_errors'],
+    })
+
+
+def decode_dataset_facts(text):
+    """ Facts of a data file from their JSON form """
+    facts = json.loads(text)
+    facts['preview'] = None
+    if facts['trial_counts'] is not None:
+        subjects = [subject for subject, _ in facts['trial_counts']]
+        counts = [count for _, count in facts['trial_counts']]
+        facts['trial_counts'] = pd.Series(counts, index=subjects, dtype='int64', name='num_trials')
+    return facts
+
+
+def cached_dataset_facts(cache_path, datafile, read_facts):
+    """ Facts of a data file (see open_motor.read_dataset_facts), read only if the file changed """
+    return cached(cache_path, datafile, 'data', read_facts, encode_dataset_facts, decode_dataset_facts)
+
+
+def cached_spreadsheet(cache_path, spreadsheet_file):
+    """ Rows of a description spreadsheet, read with read_excel only if the file changed """
+    return cached(cache_path, spreadsheet_file, 'spreadsheet', pd.read_excel,
+                  lambda T: T.to_json(orient='split', index=False),
+                  lambda text: pd.read_json(io.StringIO(text), orient='split'))
+
+
+def evict_cache(cache_path, max_age_days=None, max_bytes=None):
+    """ Drop entries unused for max_age_days, then the least recently used ones beyond max_bytes """
+    max_age_days = cache_max_age_days if max_age_days is None else max_age_days
+    max_bytes = cache_max_bytes if max_bytes is None else max_bytes
+
+    connection = connect(cache_path)
+    try:
+        with connection:
+            connection.execute('DELETE FROM facts WHERE last_used < ?', (time.time() - max_age_days * 86400,))
+
+            total = 0
+            for key, num_bytes in connection.execute('SELECT key, num_bytes FROM facts ORDER BY last_used DESC').fetchall():
+                total += num_bytes
+                if total > max_bytes:
+                    connection.execute('DELETE FROM facts WHERE key = ?', (key,))
+
+            # Forget files that no longer exist or whose facts are all gone
+            for path, content_hash in connection.execute('SELECT path, hash FROM files').fetchall():
+                in_use = connection.execute('SELECT 1 FROM facts WHERE key LIKE ? LIMIT 1', (f'%:{content_hash}',)).fetchone()
+                if not os.path.exists(path) or not in_use:
+                    connection.execute('DELETE FROM files WHERE path = ?', (path,))
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
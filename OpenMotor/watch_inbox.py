@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+ Watch an inbox folder and check every submission dropped into it
+
+ Every submission is a folder inside the inbox. The inbox is polled every
+ poll_seconds, and a folder is queued once its files have stopped changing
+ for settle_seconds, so a submission still being copied isn't checked half
+ way. Queued folders are checked in a pool of worker processes, as many at
+ a time as there are workers. pandas and the checks are imported once, when
+ the daemon and its workers start, never per submission. Each checked
+ folder gets Confirmation_Message.txt or Error_Message.txt, as with
+ open_motor.py --write-messages.
+
+ A folder is checked again when its files change after its message was
+ written, so a corrected submission can be copied over the old one. The
+ messages are the record of what has been checked: the daemon can be
+ stopped (Ctrl+C or SIGTERM) and started again at any time.
+
+ A worker that dies (e.g. killed for running out of memory) breaks the
+ pool; the pool is replaced and the folders it was checking are queued
+ again, each to be checked alone in a worker of its own. A folder whose
+ own worker dies too gets Error_Message.txt instead of another try.
+
+ Usage:
+    python watch_inbox.py inbox/ [--workers 4] [--poll-seconds 2] [--settle-seconds 5] [--cache PATH]
+    python watch_inbox.py inbox/ --once     # check what is waiting in the inbox and stop
+
+--------------------------------------------------------------------------
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Messages written into checked folders; they don't count as files of the submission
+message_files = ['Confirmation_Message.txt', 'Error_Message.txt']
+
+# Seconds between two looks at the inbox
+poll_seconds = 2.0
+
+# Seconds the files of a folder must stay unchanged before it is checked
+settle_seconds = 5.0
+
+# Submissions checked at the same time
+num_workers = os.cpu_count() or 1
+
+
+def warm_up():
+    """ Import pandas and the checks (in the daemon and in every worker as it starts) """
+    import pandas  # noqa: F401
+    import open_motor  # noqa: F401
+    import subject_stats  # noqa: F401
+    import validation_cache  # noqa: F401
+
+
+def folder_state(folder_path):
+    """ (number of files, total size, latest change) of the files of a submission, messages left out """
+    num_files, size, latest = 0, 0, 0.0
+    for directory, _, file_names in os.walk(folder_path):
+        for file_name in file_names:
+            if file_name in message_files:
+                continue
+            try:
+                stat = os.stat(os.path.join(directory, file_name))
+            except FileNotFoundError:
+                continue  # Removed while the folder was being scanned
+            num_files += 1
+            size += stat.st_size
+            latest = max(latest, stat.st_mtime)
+    return num_files, size, latest
+
+
+def message_time(folder_path):
+    """ When a message was last written into a folder (None if it has none) """
+    paths = [os.path.join(folder_path, file_name) for file_name in message_files]
+    times = [os.path.getmtime(path) for path in paths if os.path.exists(path)]
+    return max(times) if times else None
+
+
+def find_ready_folders(inbox_path, settling, queued, now, settle):
+    """
+    Folders of the inbox waiting to be checked whose files haven't changed for settle
+    seconds. settling maps each folder still changing to (its state, when it was first
+    seen in that state) and is updated here; folders already queued are skipped.
+    """
+    ready = []
+    entries = sorted((entry for entry in os.scandir(inbox_path) if entry.is_dir()), key=lambda entry: entry.name)
+    waiting = set()
+    for entry in entries:
+        if entry.path in queued:
+            continue
+        state = folder_state(entry.path)
+        checked_at = message_time(entry.path)
+        if state[0] == 0 or (checked_at is not None and state[2] <= checked_at):
+            continue  # Empty, or checked since its files last changed
+
+        waiting.add(entry.path)
+        if entry.path not in settling or settling[entry.path][0] != state:
+            settling[entry.path] = (state, now)
+        if now - settling[entry.path][1] >= settle:
+            del settling[entry.path]
+            ready.append(entry.path)
+
+    # Forget folders that were removed or checked meanwhile
+    for folder_path in set(settling) - waiting:
+        del settling[folder_path]
+    return ready
+
+
+def check_folder(folder_path, cache_path=None):
+    """ Check one submission and write its message (in a worker process); returns (passed, error) """
+    from open_motor import create_error_message, validate_submission, write_confirmation_file, write_report_message
+
+    # A message left from an earlier check of the same folder would contradict the new one
+    for file_name in message_files:
+        if os.path.exists(os.path.join(folder_path, file_name)):
+            os.remove(os.path.join(folder_path, file_name))
+
+    try:
+        report = validate_submission(folder_path, cache_path=cache_path)
+    except Exception as error:
+        message = f'ERROR. The quality check stopped: {error}'
+        write_confirmation_file(create_error_message(message), os.path.join(folder_path, 'Error_Message.txt'))
+        return False, message
+    write_report_message(report)
+    return report['passed'], report['error']
+
+
+def new_executor(workers):
+    """ Worker pool for the checks, every worker warmed up as it starts """
+    return ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+
+
+def give_up_folder(folder_path):
+    """ Write Error_Message.txt (from the daemon) for a folder whose check killed its own worker """
+    from open_motor import create_error_message, write_confirmation_file
+
+    message = ('ERROR. The quality check stopped: the process checking this submission died '
+               '(out of memory?). Please contact the maintainers.')
+    write_confirmation_file(create_error_message(message), os.path.join(folder_path, 'Error_Message.txt'))
+    return message
+
+
+async def check_queued(queue, queued, pool, cache_path, counts, suspects):
+    """ Check queued folders one after another in the worker pool (one of these runs per worker) """
+    loop = asyncio.get_running_loop()
+    while True:
+        folder_path = await queue.get()
+        requeued = False
+        try:
+            # A folder that was in a pool when a worker died is checked alone, so a death there is its own
+            alone = folder_path in suspects
+            executor = new_executor(1) if alone else pool['executor']
+            try:
+                passed, error = await loop.run_in_executor(executor, check_folder, folder_path, cache_path)
+            except BrokenProcessPool:
+                if alone:
+                    passed, error = False, give_up_folder(folder_path)
+                else:
+                    # Every check running in the pool fails, so any of them may have killed the worker
+                    if pool['executor'] is executor:
+                        executor.shutdown(wait=False)
+                        pool['executor'] = new_executor(pool['workers'])
+                    suspects.add(folder_path)
+                    print(f'RETRY: {folder_path} (a worker process died)', flush=True)
+                    requeued = True
+                    queue.put_nowait(folder_path)
+                    continue
+            finally:
+                if alone:
+                    executor.shutdown(wait=False)
+            suspects.discard(folder_path)
+            counts['passed' if passed else 'failed'] += 1
+            print(f'PASSED: {folder_path}' if passed else f'FAILED: {folder_path} ({error.strip()})', flush=True)
+        except Exception as error:  # E.g. the message couldn't be written; the folder is tried again once it settles
+            counts['failed'] += 1
+            print(f'ERROR: {folder_path} ({error})', flush=True)
+        finally:
+            if not requeued:
+                queued.discard(folder_path)
+            queue.task_done()
+
+
+async def watch_inbox(inbox_path, workers=None, poll=None, settle=None, cache_path=None, once=False):
+    """
+    Check the submissions of an inbox folder as they arrive, until cancelled.
+    With once, checks the folders waiting in the inbox and returns {'passed': n, 'failed': n}.
+    """
+    workers = workers or num_workers
+    poll = poll_seconds if poll is None else poll
+    settle = settle_seconds if settle is None else settle
+    warm_up()
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    queued = set()
+    settling = {}
+    counts = {'passed': 0, 'failed': 0}
+    suspects = set()  # Folders being checked when a worker of the pool died
+    pool = {'executor': new_executor(workers), 'workers': workers}  # Replaced by the checkers when a worker dies
+    checkers = [asyncio.create_task(check_queued(queue, queued, pool, cache_path, counts, suspects)) for _ in range(workers)]
+    try:
+        while True:
+            # Scanning reads the file system, so it runs in a thread and never holds up the checkers
+            ready = await asyncio.to_thread(find_ready_folders, inbox_path, settling, queued, loop.time(), settle)
+            for folder_path in ready:
+                queued.add(folder_path)
+                queue.put_nowait(folder_path)
+            if once and not settling:
+                await queue.join()
+                break
+            await asyncio.sleep(poll)
+    finally:
+        for checker in checkers:
+            checker.cancel()
+        await asyncio.gather(*checkers, return_exceptions=True)
+        pool['executor'].shutdown()
+
+    if cache_path:
+        from validation_cache import evict_cache
+        evict_cache(cache_path)
+    return counts
+
+
+async def run_until_stopped(inbox_path, workers, poll, settle, cache_path, once):
+    """ Run watch_inbox, stopping cleanly on SIGTERM as on Ctrl+C """
+    task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except (NotImplementedError, AttributeError):
+        pass  # No signal handlers in the event loop on Windows; Ctrl+C still stops the daemon
+    return await watch_inbox(inbox_path, workers, poll, settle, cache_path, once)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the submissions dropped into an inbox folder as they arrive.')
+    parser.add_argument('inbox', help='folder watched for submission folders')
+    parser.add_argument('--workers', type=int, default=num_workers, help='submissions checked at the same time')
+    parser.add_argument('--poll-seconds', type=float, default=poll_seconds, help='seconds between two looks at the inbox')
+    parser.add_argument('--settle-seconds', type=float, default=settle_seconds,
+                        help='seconds the files of a folder must stay unchanged before it is checked')
+    parser.add_argument('--cache', metavar='PATH', help='reuse the results of unchanged files from this cache file')
+    parser.add_argument('--once', action='store_true', help='check the folders waiting in the inbox, then stop')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.inbox):
+        parser.error(f'{args.inbox} is not a folder')
+
+    print(f'Watching {args.inbox} with {args.workers} workers', flush=True)
+    try:
+        counts = asyncio.run(run_until_stopped(args.inbox, args.workers, args.poll_seconds, args.settle_seconds,
+                                               args.cache, args.once))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print('Stopped', flush=True)
+        return 0
+    print(f'Checked {counts["passed"] + counts["failed"]} submissions: {counts["passed"]} passed, {counts["failed"]} failed')
+    return 0 if not counts['failed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
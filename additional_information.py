@@ -1,12 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import hashlib
-import csv
-import subprocess
 
-# Function to hash email addresses for anonymization
-def hash_email(email):
-    return hashlib.sha256(email.encode()).hexdigest()
+# Projects are kept in the SQLite registry; standardization runs in this process and window
+from project_registry import add_project, doi_submitted, hash_email, registry_columns, registry_path
+from upload_csv import upload_and_update_csvs
 
 # Function to handle project type selection
 def on_project_type_change(event):
@@ -46,7 +43,7 @@ def on_project_type_change(event):
     email_label.grid(padx=10, pady=5, sticky="w")
     email_entry.grid(padx=10, pady=5, sticky="w")
 
-# Function to save data and run upload_csv.py
+# Function to save data and standardize the data files
 def save_data():
     project_type = project_type_var.get()
     title = title_var.get()
@@ -72,30 +69,26 @@ def save_data():
 
     # Compile data
     data = [project_type, title, authors, citation, doi, date, journal, country, description, additional_comments, hashed_email]
-    headers = ["Project Type", "Title", "Authors", "Citation", "DOI", "Date", "Journal", "Country", "Description", "Additional Comments", "Hashed Email"]
+    headers = list(registry_columns.values())
 
     # Confirm information
     confirmation_message = f"Please confirm the following information:\n\n"
     for header, value in zip(headers, data):
         confirmation_message += f"{header}: {value}\n"
 
+    # Warn if the DOI is already in the registry (an index lookup)
+    if doi and doi_submitted(registry_path, doi):
+        confirmation_message += f"\nA project with DOI {doi} has already been submitted.\n"
+
     confirm = messagebox.askyesno("Confirm Information", confirmation_message)
     if confirm:
-        # Write to CSV file
-        file_name = "projects.csv"
-        with open(file_name, mode="a", newline="") as file:
-            writer = csv.writer(file)
-            if file.tell() == 0:  # If the file is empty, write headers
-                writer.writerow(headers)
-            writer.writerow(data)
-        
-        # Run upload_csv.py
-        try:
-            subprocess.run(["python", "upload_csv.py"], check=True)
-            messagebox.showinfo("Success", "Data saved and upload_csv.py ran successfully!")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to run upload_csv.py: {e}")
-        
+        # Add the project to the registry
+        add_project(registry_path, dict(zip(registry_columns, data)))
+
+        # Standardize the data files in this window
+        messagebox.showinfo("Saved", "Project saved. Please choose the data files to standardize.")
+        upload_and_update_csvs()
+
         window.quit()
     else:
         edit_fields()
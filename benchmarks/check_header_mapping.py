@@ -0,0 +1,69 @@
+"""
+--------------------------------------------------------------------------
+ Check of the header resolver of the standardizer
+
+ Resolves a list of legacy headers with the standardizer's mapping and
+ compares each result with the expected standardized name and how it was
+ found (exact, normalized, fuzzy or unmapped). Headers that differ from an
+ entry only by a number or a word must stay unmapped: a renamed column
+ would carry the wrong meaning into every standardized file.
+
+ Usage:
+    python benchmarks/check_header_mapping.py
+
+ Prints every mismatch and exits with 1 if there is any.
+
+--------------------------------------------------------------------------
+"""
+
+import os
+import sys
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_path)
+
+# Header -> (expected standardized name, how it is found)
+cases = {
+    "hand_theta": ("Hand angle", "exact"),
+    "Hand Theta": ("Hand angle", "normalized"),
+    "RT ": ("Reaction time", "normalized"),
+    "hand_theta_50": ("Hand angle at 50 miliseconds into the movement", "exact"),
+    "HandTheta 50": ("Hand angle at 50 miliseconds into the movement", "fuzzy"),
+    "hand_theta_51": ("hand_theta_51", "unmapped"),
+    "Sleep2": ("Sleep2", "unmapped"),
+    "Hand_IB2": ("Hand_IB2", "unmapped"),
+    "rating2": ("rating2", "unmapped"),
+    "Hand_thata": ("Hand_thata", "unmapped"),
+}
+
+# Columns resolved together -> expected standardized names (a fuzzy match can't take a target spelled exactly)
+column_cases = [
+    (["SN", "Exp", "Exp2", "rating", "rating2"], ["Subject ID", "Experiment", "Exp2", "Enjoyment", "rating2"]),
+]
+
+
+def main():
+    from csv_standardizer import abbreviation_mapping, template_headers
+    from header_mapping import compile_mapping, resolve_columns, resolve_header
+
+    failures = []
+    resolver = compile_mapping(abbreviation_mapping, protected_headers=template_headers)
+    for header, expected in cases.items():
+        result = resolve_header(resolver, header)
+        if result != expected:
+            failures.append(f"{header!r} resolved to {result}, expected {expected}")
+
+    for columns, expected in column_cases:
+        resolver = compile_mapping(abbreviation_mapping, protected_headers=template_headers)
+        new_columns, _ = resolve_columns(resolver, columns)
+        if new_columns != expected:
+            failures.append(f"{columns} resolved to {new_columns}, expected {expected}")
+
+    for failure in failures:
+        print(f"MISMATCH: {failure}")
+    print(f"{len(cases) + len(column_cases) - len(failures)} of {len(cases) + len(column_cases)} header cases resolved as expected")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
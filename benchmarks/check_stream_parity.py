@@ -0,0 +1,112 @@
+"""
+--------------------------------------------------------------------------
+ Parity of the streamed and the in-memory quality check
+
+ Data files above the stream threshold are checked chunk by chunk from a
+ running per-subject state (subject_stats.update_trial_state) instead of
+ one index of the whole file. Both must find the same facts. This writes
+ a set of small data files (in order, shuffled, with missing or repeated
+ subject and trial numbers, with values that don't fit their column) and
+ compares read_dataset_facts with stream=False against stream=True for
+ several chunk sizes: number of rows, trials per subject, whether the rows
+ are sorted, dtype violations and trial order errors.
+
+ Usage:
+    python benchmarks/check_stream_parity.py
+
+ Prints every mismatch and exits with 1 if there is any.
+
+--------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_path, "OpenMotor"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Chunk sizes the streamed check is run with (small, so subjects and blocks span chunks)
+chunk_sizes = [11, 50]
+
+
+def set_cell(dataframe, row, column, value):
+    """ Copy of a dataframe with one cell changed """
+    changed = dataframe.copy()
+    changed.loc[changed.index[row], column] = value
+    return changed
+
+
+def parity_cases(seed=0):
+    """ Name -> dataframe (all values as text) of every case compared """
+    from make_submission import generate_trials
+
+    rng = np.random.default_rng(seed)
+    base = generate_trials(rng, np.array([70, 65, 70, 62]), 30).astype(str)  # Two blocks per subject
+    shuffled = base.sample(frac=1, random_state=seed)
+    repeat = set_cell(base, 20, "trial_number", base["trial_number"].iloc[19])
+    skip = set_cell(base, 100, "trial_number", "999")
+    down = set_cell(base, 140, "block_number", "2")  # Trial 6 of subject 3 moved to block 2
+
+    return {
+        "sorted": base,
+        "shuffled": shuffled,
+        "shuffled_within_subject": base.groupby("Subj_idx", sort=False, group_keys=False).sample(frac=1, random_state=seed),
+        "interleaved_subjects": base.sort_values("trial_number", key=lambda column: column.astype(int), kind="stable"),
+        "repeated_trial": repeat,
+        "skipped_trial": skip,
+        "trial_down_between_blocks": down,
+        "repeat_and_skip_shuffled": set_cell(repeat, 100, "trial_number", "999").sample(frac=1, random_state=seed),
+        "missing_subject": set_cell(base, 60, "Subj_idx", ""),
+        "missing_subject_shuffled": set_cell(base, 60, "Subj_idx", "").sample(frac=1, random_state=seed),
+        "missing_trial": set_cell(base, 80, "trial_number", ""),
+        "text_subject": base.assign(Subj_idx="S" + base["Subj_idx"]),
+        "fractional_subject": set_cell(base, 5, "Subj_idx", "1.5"),
+        "text_in_float_column": set_cell(base, 150, "hand_angle", "left"),
+        "texts_in_float_column": set_cell(set_cell(set_cell(base, 5, "hand_angle", "left"), 120, "hand_angle", "right"),
+                                          250, "hand_angle", "up"),
+        "fraction_then_text_in_trials": set_cell(set_cell(base, 3, "trial_number", "2.5"), 200, "trial_number", "x"),
+    }
+
+
+def comparable_facts(facts):
+    """ The facts both checks must agree on, in a form that compares with == """
+    counts = facts["trial_counts"]
+    return {
+        "num_rows": facts["num_rows"],
+        "trial_counts": [(str(subject), int(count)) for subject, count in counts.items()],
+        "rows_sorted": facts["rows_sorted"],
+        "violations": facts["violations"],
+        "trial_order_errors": facts["trial_order_errors"],
+    }
+
+
+def main():
+    from open_motor import read_dataset_facts
+
+    failures = []
+    cases = parity_cases()
+    with tempfile.TemporaryDirectory() as folder_path:
+        for name, dataframe in cases.items():
+            datafile = os.path.join(folder_path, f"data_{name}.csv")
+            dataframe.to_csv(datafile, index=False)
+
+            expected = comparable_facts(read_dataset_facts(datafile, stream=False))
+            for chunk_rows in chunk_sizes:
+                streamed = comparable_facts(read_dataset_facts(datafile, stream=True, chunk_rows=chunk_rows))
+                for fact, value in expected.items():
+                    if streamed[fact] != value:
+                        failures.append(f"{name}, chunks of {chunk_rows} rows: {fact} is {streamed[fact]!r}, in memory {value!r}")
+
+    for failure in failures:
+        print(f"MISMATCH: {failure}")
+    print(f"{len(cases)} cases compared in chunks of {', '.join(map(str, chunk_sizes))} rows: "
+          f"{'all facts match' if not failures else f'{len(failures)} mismatches'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+--------------------------------------------------------------------------
+ Synthetic submissions for benchmarking
+
+ Writes a submission folder that passes the quality check: one data file
+ and readme per dataset and a description spreadsheet whose subject and
+ trial counts match the data. Every subject does baseline, rotation and
+ washout blocks toward a few targets, learning the rotation along an
+ exponential curve, with realistic reaction and movement times and a few
+ columns left as "None Provided".
+
+ Optionally also writes legacy CSV files with the abbreviated headers of
+ csv_standardizer.abbreviation_mapping (some in other spellings), the input
+ of the header standardizer.
+
+ The same seed always gives the same files.
+
+ Usage:
+    python benchmarks/make_submission.py out/ --datasets 3 --subjects 40 --trials 300 [--legacy-files 4] [--seed 0]
+
+--------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_path, "OpenMotor"))
+from motor_database import catalog_columns
+from motor_schema import column_dtypes, required_columns
+
+# Trials per block (baseline, rotation and washout blocks repeat in this order)
+trials_per_block = 60
+
+# Rotation sizes in degrees, one per dataset in turn
+rotation_sizes = [15, 30, 45]
+
+# Target angles in degrees
+target_angles = [45, 135, 225, 315]
+
+# Columns left as "None Provided" in every file
+unreported_columns = ["search_time", "neuro_description", "cognitive_assessment", "cognitive_assessment_score", "hand_base"]
+
+# Legacy columns written by generate_legacy_files, with the schema column their values come from
+legacy_columns = {
+    "SN": "Subj_idx", "TN": "trial_number", "BN": "block_number", "Cond": "condition",
+    "hand_theta": "hand_angle", "ti": "target_angle", "ri": "rotation_angle",
+    "RT": "reaction_time", "MT": "movement_time", "Tgt size": "target_width",
+}
+
+# Other spellings of legacy headers, used in every second legacy file
+legacy_variants = {"hand_theta": "Hand Theta", "RT": "rt ", "Tgt size": "tgt_size"}
+
+
+def dataset_names(num_datasets):
+    """ Name_in_database of every dataset """
+    return [f"Synthetic_{2000 + dataset}_Expt{dataset + 1}" for dataset in range(num_datasets)]
+
+
+def trial_counts(rng, num_subjects, trials_per_subject, missing_trials):
+    """ Number of trials of every subject: trials_per_subject minus up to missing_trials """
+    return trials_per_subject - rng.integers(0, missing_trials + 1, num_subjects)
+
+
+def generate_trials(rng, counts, rotation_size):
+    """ One dataframe with the trials of every subject in the standardized schema """
+    num_rows = int(counts.sum())
+    subjects = np.repeat(np.arange(1, len(counts) + 1), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    trial = np.arange(num_rows) - starts + 1
+    block = (trial - 1) // trials_per_block + 1
+
+    # Blocks go baseline, rotation, washout, baseline, ...
+    rotated = (block % 3) == 2
+    direction = np.repeat(rng.choice([-1, 1], len(counts)), counts)
+    rotation = np.where(rotated, rotation_size * direction, 0)
+
+    # Exponential learning of the rotation within each rotation block, plus motor noise
+    time_constant = np.repeat(rng.uniform(10, 40, len(counts)), counts)
+    trial_in_block = (trial - 1) % trials_per_block
+    adaptation = np.where(rotated, -rotation * (1 - np.exp(-trial_in_block / time_constant)), 0)
+    target = rng.choice(target_angles, num_rows)
+    hand = np.mod(target + adaptation + rng.normal(0, 4, num_rows), 360)
+
+    data = {}
+    for column in required_columns:
+        dtype = column_dtypes[column]
+        if dtype == "category":
+            data[column] = rng.choice(["a", "b"], num_rows)
+        elif dtype.startswith("Int"):
+            data[column] = np.zeros(num_rows, dtype="int64")
+        else:
+            data[column] = rng.normal(0, 1, num_rows).round(3)
+
+    data.update({
+        "Subj_idx": subjects, "trial_number": trial, "block_number": block,
+        "target_angle": target, "rotation_angle": rotation, "hand_angle": hand.round(3),
+        "rotation_direction": direction, "hand_flip": np.zeros(num_rows, dtype="int64"),
+        "reaction_time": rng.lognormal(np.log(0.4), 0.25, num_rows).round(3),
+        "movement_time": rng.lognormal(np.log(0.3), 0.2, num_rows).round(3),
+        "feedback_type": np.where(rotated, "rotated cursor", "veridical cursor"),
+        "condition": np.where(rotated, "rotation", np.where(block % 3 == 0, "washout", "baseline")),
+        "research_setting": "lab", "input_device": "tablet",
+        "subject_age": np.repeat(rng.integers(18, 80, len(counts)), counts),
+        "subject_sex": np.repeat(rng.choice(["F", "M"], len(counts)), counts),
+        "number_of_targets": len(target_angles), "target_type": "circle",
+        "target_width": 6.0, "target_height": 6.0, "screen_height": 1080.0, "screen_width": 1920.0,
+    })
+    dataframe = pd.DataFrame({column: data[column] for column in required_columns})
+    for column in unreported_columns:
+        dataframe[column] = "None Provided"
+    return dataframe
+
+
+def spreadsheet_row(name, counts):
+    """ Description spreadsheet row of one dataset, matching its data """
+    row = {column: "None Provided" for column in catalog_columns}
+    row.update({
+        "Category": "Sensorimotor", "Name_in_database": name, "Authors": "Synthetic", "Journal": "None",
+        "Year": int(name.split("_")[1]), "Expt_in_paper": name.split("_")[2], "Condition": "Rotation",
+        "Num_subjects": len(counts), "Min_trials_per_subject": int(counts.min()),
+        "Max_trials_per_subject": int(counts.max()), "Num_tasks_x_conditions": 1,
+        "Movement_type": "Reaching", "Feedback_type": "Visual",
+    })
+    return row
+
+
+def generate_submission(folder_path, num_datasets=3, num_subjects=40, trials_per_subject=300, missing_trials=10, seed=0):
+    """ Write a synthetic submission folder; returns the number of trials written """
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder_path, exist_ok=True)
+
+    rows = []
+    num_trials = 0
+    for dataset, name in enumerate(dataset_names(num_datasets)):
+        counts = trial_counts(rng, num_subjects, trials_per_subject, missing_trials)
+        generate_trials(rng, counts, rotation_sizes[dataset % len(rotation_sizes)]).to_csv(
+            os.path.join(folder_path, f"data_{name}.csv"), index=False)
+        with open(os.path.join(folder_path, f"readme_{name}.txt"), "w") as file:
+            file.write(f"{name}: synthetic visuomotor rotation dataset generated with seed {seed}.\n")
+        rows.append(spreadsheet_row(name, counts))
+        num_trials += int(counts.sum())
+
+    pd.DataFrame(rows, columns=catalog_columns).to_excel(
+        os.path.join(folder_path, "Open_Motor Description.xlsx"), index=False)
+    return num_trials
+
+
+def generate_legacy_files(folder_path, num_files=4, num_subjects=40, trials_per_subject=300, seed=0):
+    """ Write legacy CSV files with abbreviated headers; returns the number of rows written """
+    rng = np.random.default_rng(seed + 1)
+    os.makedirs(folder_path, exist_ok=True)
+
+    num_rows = 0
+    for file_number in range(num_files):
+        counts = trial_counts(rng, num_subjects, trials_per_subject, 0)
+        trials = generate_trials(rng, counts, rotation_sizes[file_number % len(rotation_sizes)])
+        headers = {abbreviation: (legacy_variants.get(abbreviation, abbreviation) if file_number % 2 else abbreviation)
+                   for abbreviation in legacy_columns}
+        legacy = pd.DataFrame({headers[abbreviation]: trials[column] for abbreviation, column in legacy_columns.items()})
+        legacy.to_csv(os.path.join(folder_path, f"legacy_{file_number + 1}.csv"), index=False)
+        num_rows += len(legacy)
+    return num_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic submission folder for benchmarking.")
+    parser.add_argument("folder", help="folder to write the submission to")
+    parser.add_argument("--datasets", type=int, default=3, help="number of datasets")
+    parser.add_argument("--subjects", type=int, default=40, help="subjects per dataset")
+    parser.add_argument("--trials", type=int, default=300, help="trials per subject (some subjects have up to 10 fewer)")
+    parser.add_argument("--legacy-files", type=int, default=0, help="also write this many legacy CSV files to <folder>/legacy")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+
+    num_trials = generate_submission(args.folder, args.datasets, args.subjects, args.trials, seed=args.seed)
+    print(f"Wrote {args.datasets} datasets with {num_trials} trials to {args.folder}")
+    if args.legacy_files:
+        legacy_path = os.path.join(args.folder, "legacy")
+        num_rows = generate_legacy_files(legacy_path, args.legacy_files, args.subjects, args.trials, args.seed)
+        print(f"Wrote {args.legacy_files} legacy files with {num_rows} rows to {legacy_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+--------------------------------------------------------------------------
+ Benchmarks of the quality check and the header standardizer
+
+ Generates a synthetic submission (make_submission.py) and times every
+ stage of the pipeline in its own fresh process, recording
+    seconds          best wall time over --repeat runs (imports excluded)
+    peak_rss_mb      peak resident memory of the process running the stage
+                     (start_rss_mb is its memory after importing pandas, before the stage)
+    rows_per_second  trials processed per second, for stages that read trials
+
+ Results are compared with a stored baseline (benchmarks/baseline.json by
+ default): a stage slower or larger than the baseline by more than
+ --tolerance is reported, and the run exits with 1.
+
+ Usage:
+    python benchmarks/run_benchmarks.py [--subjects 40 --trials 300 --datasets 3 --legacy-files 4]
+                                        [--workers 4] [--repeat 3] [--output results.json]
+    python benchmarks/run_benchmarks.py --save-baseline     # record this machine's baseline
+
+--------------------------------------------------------------------------
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+repo_path = os.path.dirname(benchmarks_path)
+sys.path.insert(0, repo_path)
+sys.path.insert(0, os.path.join(repo_path, "OpenMotor"))
+
+# Baseline the results are compared with
+baseline_path = os.path.join(benchmarks_path, "baseline.json")
+
+# A stage may be this much slower or larger than the baseline before it is reported
+default_tolerance = 0.25
+
+
+def stage_discovery(folder_path, workers):
+    """ Find the submission files and check the headers of the data files """
+    from open_motor import check_headers, find_submission_files
+
+    data_files, _, _ = find_submission_files(folder_path)
+    check_headers(data_files)
+    return 0
+
+
+def stage_spreadsheet(folder_path, workers):
+    """ Load the description spreadsheet """
+    import pandas as pd
+
+    pd.read_excel(glob.glob(os.path.join(folder_path, "*.xlsx"))[0])
+    return 0
+
+
+def stage_parse(folder_path, workers):
+    """ Read every data file into the schema dtypes """
+    from motor_schema import read_data_csv
+
+    return sum(len(read_data_csv(datafile)[0]) for datafile in sorted(glob.glob(os.path.join(folder_path, "*data*.csv"))))
+
+
+def stage_validate(folder_path, workers):
+    """ Full quality check, one dataset after another """
+    from open_motor import validate_submission
+
+    report = validate_submission(folder_path)
+    if not report["passed"]:
+        raise ValueError(f"ERROR. The synthetic submission failed the quality check: {report['error']}")
+    return sum(dataset_report["num_rows"] for dataset_report in report["datasets"])
+
+
+def stage_validate_parallel(folder_path, workers):
+    """ Full quality check with the datasets spread over worker processes """
+    from open_motor import validate_submission
+
+    report = validate_submission(folder_path, workers=workers)
+    if not report["passed"]:
+        raise ValueError(f"ERROR. The synthetic submission failed the quality check: {report['error']}")
+    return sum(dataset_report["num_rows"] for dataset_report in report["datasets"])
+
+
+def stage_standardize(folder_path, workers):
+    """ Standardize the headers of the legacy files and save them as CSV """
+    from csv_standardizer import standardize_files
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        summaries = standardize_files(sorted(glob.glob(os.path.join(folder_path, "legacy", "*.csv"))), output_dir)
+    failed = [summary for summary in summaries if summary["error"]]
+    if failed:
+        raise ValueError(f"ERROR. Standardizing {failed[0]['input']} failed: {failed[0]['error']}")
+    return sum(summary["rows"] for summary in summaries)
+
+
+# Pipeline stages in the order they run
+stages = {
+    "discovery": stage_discovery,
+    "spreadsheet": stage_spreadsheet,
+    "parse": stage_parse,
+    "validate": stage_validate,
+    "validate_parallel": stage_validate_parallel,
+    "standardize": stage_standardize,
+}
+
+
+def run_stage(stage, folder_path, workers):
+    """ Run one stage in this process and return its measurements (called in a fresh process) """
+    import pandas  # noqa: F401  Imported before timing, so every stage is timed without the import
+
+    start_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    rows = stages[stage](folder_path, workers)
+    seconds = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux; worker processes count too
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {"seconds": seconds, "rows": rows, "peak_rss_mb": peak_kb / 1024, "start_rss_mb": start_kb / 1024}
+
+
+def measure_stage(stage, folder_path, workers, repeat):
+    """ Best of repeat runs of one stage, each in a fresh process """
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-stage", stage,
+                                 "--folder", folder_path, "--workers", str(workers)],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ValueError(f"ERROR. Stage {stage} failed:\n{result.stderr}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    best = min(runs, key=lambda run: run["seconds"])
+    best["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+    best["rows_per_second"] = best["rows"] / best["seconds"] if best["rows"] and best["seconds"] else None
+    return best
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """ Stages that got slower or larger than the baseline by more than tolerance """
+    regressions = []
+    for stage, result in results["stages"].items():
+        if stage not in baseline.get("stages", {}):
+            continue
+        reference = baseline["stages"][stage]
+        if result["seconds"] > reference["seconds"] * (1 + tolerance):
+            regressions.append(f"{stage}: {result['seconds']:.3f} s vs {reference['seconds']:.3f} s in the baseline")
+        if result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{stage}: {result['peak_rss_mb']:.0f} MB vs {reference['peak_rss_mb']:.0f} MB in the baseline")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the quality check and the header standardizer.")
+    parser.add_argument("--datasets", type=int, default=3, help="datasets in the synthetic submission")
+    parser.add_argument("--subjects", type=int, default=40, help="subjects per dataset")
+    parser.add_argument("--trials", type=int, default=300, help="trials per subject")
+    parser.add_argument("--legacy-files", type=int, default=4, help="legacy files to standardize")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic submission")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="workers of the parallel stage")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every stage; the fastest counts")
+    parser.add_argument("--stages", nargs="+", choices=list(stages), default=list(stages), help="stages to run")
+    parser.add_argument("--baseline", default=baseline_path, help="baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=default_tolerance, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--output", metavar="PATH", help="also write the results as JSON to PATH")
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.folder, args.workers)))
+        return 0
+
+    from make_submission import generate_legacy_files, generate_submission
+
+    scale = {"datasets": args.datasets, "subjects": args.subjects, "trials": args.trials,
+             "legacy_files": args.legacy_files, "seed": args.seed, "workers": args.workers}
+    results = {"scale": scale, "stages": {}}
+    with tempfile.TemporaryDirectory() as folder_path:
+        generate_submission(folder_path, args.datasets, args.subjects, args.trials, seed=args.seed)
+        generate_legacy_files(os.path.join(folder_path, "legacy"), args.legacy_files, args.subjects, args.trials, args.seed)
+
+        for stage in args.stages:
+            result = measure_stage(stage, folder_path, args.workers, args.repeat)
+            results["stages"][stage] = result
+            speed = f", {result['rows_per_second']:,.0f} rows/s" if result["rows_per_second"] else ""
+            print(f"{stage:<18} {result['seconds']:8.3f} s  {result['peak_rss_mb']:7.0f} MB peak "
+                  f"({result['peak_rss_mb'] - result['start_rss_mb']:+.0f} MB in the stage){speed}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("scale") != scale:
+        print("The baseline was recorded at another scale; its numbers are not comparable.")
+        return 0
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"SLOWER THAN BASELINE: {regression}")
+    if not regressions:
+        print(f"All stages within {args.tolerance:.0%} of the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
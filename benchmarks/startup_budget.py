@@ -0,0 +1,142 @@
+"""
+--------------------------------------------------------------------------
+ Startup budget for the entry points
+
+ Checks, in fresh interpreters, that
+    - importing open_motor.py, upload_csv.py and the modules
+      additional_information.py imports stays within import_budget_seconds
+      and loads none of the heavy modules (pandas, NumPy, openpyxl, pyarrow)
+    - finding the files of a submission and checking their headers doesn't
+      load pandas
+    - a trivial submission passes the quality check within
+      trivial_submission_budget_seconds, start to finish
+
+ Usage:
+    python benchmarks/startup_budget.py
+
+ Prints every measurement and exits with 1 if any budget is exceeded.
+
+--------------------------------------------------------------------------
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+openmotor_path = os.path.join(repo_path, "OpenMotor")
+
+# Budgets
+import_budget_seconds = 0.15
+trivial_submission_budget_seconds = 1.0
+
+# Modules no entry point may load at import time
+heavy_modules = ["pandas", "numpy", "openpyxl", "pyarrow"]
+
+# Module imported for each entry point (additional_information.py opens its window on import,
+# so the modules it imports are measured instead)
+entry_points = {
+    "open_motor.py": "import open_motor",
+    "upload_csv.py": "import upload_csv",
+    "additional_information.py": "import project_registry, upload_csv",
+}
+
+
+def python_env():
+    """ Environment in which both the top folder and OpenMotor are importable """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([repo_path, openmotor_path, env.get("PYTHONPATH", "")])
+    return env
+
+
+def measure_import(statement):
+    """ Cumulative import time in seconds of a statement and the top-level modules it loaded, from -X importtime """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], env=python_env(),
+                            capture_output=True, text=True, check=True)
+    total_us = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  ") and cumulative.strip().isdigit():
+            total_us += int(cumulative)  # Only top-level lines, whose times include their imports
+        loaded.add(name.strip().split(".")[0])
+    return total_us / 1e6, loaded
+
+
+def header_check_loads_pandas(folder_path):
+    """ True if finding the files of a submission and checking their headers loads pandas """
+    statement = ("import sys, open_motor; "
+                 f"data_files, _, _ = open_motor.find_submission_files({folder_path!r}); "
+                 "open_motor.check_headers(data_files); "
+                 "print('pandas' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", statement], env=python_env(), capture_output=True, text=True, check=True)
+    return result.stdout.strip() == "True"
+
+
+def write_trivial_submission(folder_path, dataset_name="Tiny_2024_Expt1", num_subjects=2, num_trials=5):
+    """ Write a submission with one small dataset that passes the quality check """
+    from openpyxl import Workbook
+
+    sys.path.insert(0, openmotor_path)
+    from motor_schema import column_dtypes, required_columns
+
+    with open(os.path.join(folder_path, f"data_{dataset_name}.csv"), "w") as file:
+        file.write(",".join(required_columns) + "\n")
+        for subject in range(1, num_subjects + 1):
+            for trial in range(1, num_trials + 1):
+                values = {"Subj_idx": subject, "trial_number": trial, "block_number": 1}
+                row = [str(values.get(column, 0 if column_dtypes[column] != "category" else "a"))
+                       for column in required_columns]
+                file.write(",".join(row) + "\n")
+
+    with open(os.path.join(folder_path, f"readme_{dataset_name}.txt"), "w") as file:
+        file.write("Trivial submission used to measure startup time.\n")
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Name_in_database", "Num_subjects", "Min_trials_per_subject", "Max_trials_per_subject"])
+    sheet.append([dataset_name, num_subjects, num_trials, num_trials])
+    workbook.save(os.path.join(folder_path, "Open_Motor Description.xlsx"))
+
+
+def main():
+    failures = []
+
+    for entry_point, statement in entry_points.items():
+        seconds, loaded = measure_import(statement)
+        heavy = sorted(set(heavy_modules) & loaded)
+        print(f"{entry_point}: imports in {seconds:.3f} s" + (f", loads {', '.join(heavy)}" if heavy else ""))
+        if seconds > import_budget_seconds:
+            failures.append(f"{entry_point} takes {seconds:.3f} s to import (budget {import_budget_seconds} s)")
+        if heavy:
+            failures.append(f"{entry_point} loads {', '.join(heavy)} at import")
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        write_trivial_submission(folder_path)
+
+        loads_pandas = header_check_loads_pandas(folder_path)
+        print("File discovery and header checks: " + ("load pandas" if loads_pandas else "no pandas"))
+        if loads_pandas:
+            failures.append("finding submission files and checking headers loads pandas")
+
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, os.path.join(openmotor_path, "open_motor.py"), folder_path],
+                                capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        print(f"Trivial submission: {result.stdout.strip() or result.stderr.strip()} in {seconds:.3f} s")
+        if result.returncode != 0:
+            failures.append(f"the trivial submission did not pass: {result.stdout.strip()} {result.stderr.strip()}")
+        if seconds > trivial_submission_budget_seconds:
+            failures.append(f"the trivial submission took {seconds:.3f} s (budget {trivial_submission_budget_seconds} s)")
+
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
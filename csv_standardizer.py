@@ -0,0 +1,190 @@
+"""
+--------------------------------------------------------------------------
+ Headless CSV header standardizer
+
+ Renames the columns of legacy data files with abbreviation_mapping, fits
+ them into the standardized template and saves each one next to the others
+ in an output folder. upload_csv.py is the graphical front end of this module.
+
+ Usage:
+    python csv_standardizer.py "legacy/*.csv" --output-dir standardized [--workers N] [--format csv]
+
+ Files are saved as csv (default), parquet, feather or xlsx; see output_writers.py.
+ Columns keep compact nullable dtypes and missing values are written as
+ empty cells or nulls, or as a marker given with --missing-marker (e.g.
+ "None Provided") in csv and xlsx files.
+
+ A summary of every file (rows, columns, unmapped columns, errors) is
+ written to standardize_summary.csv in the output folder.
+
+--------------------------------------------------------------------------
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared modules of the quality check (standardized schema) live in the OpenMotor folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "OpenMotor"))
+from motor_schema import apply_schema, infer_nullable_dtypes, read_data_csv, widen_floats
+from header_mapping import compile_mapping, resolve_columns
+from output_writers import is_text_format, output_formats, write_output
+
+# Abbreviation to standardized name mapping
+abbreviation_mapping = {
+    "SN": "Subject ID", "TN": "Trial number", "CN": "Condition number", "BN": "Block number", "Cond": "Condition",
+    "CCW": "Counterclockwise", "Tgt size": "Target size", "hand_theta": "Hand angle", "hand_theta_maxv": "Hand angle max velocity",
+    "hand_theta_maxradv": "Hand angle max radial velocity", "handMaxRadExt": "Maximum radial extension of the hand",
+    "hand_theta_50": "Hand angle at 50 miliseconds into the movement", "Raw_ep_hand_ang": "Raw endpoint hand angle",
+    "ti": "Target Index", "fbi": "Feeback Index", "ri": "Rotation Index", "clampi": "Clamp Index",
+    "MT": "Movement time", "RT": "Reaction time", "ST": "Search time", "radvelmax": "Maximum radial velocity",
+    "maxRadDist": "Maximum radial distance", "testMaxRadDist": "Test maximum radial distance", "PB": "Proprioceptive bias",
+    "RB": "Rotational bias", "HL_X": "Hand location X-coordinate", "HL_Y": "Hand location Y-coordinate",
+    "FC_bias_X": "Feedback Cursor X-coordinate bias", "FC_bias_Y": "Feedback Cursor Y-coordinate bias",
+    "prop_theta": "Proprioceptive Judgement Angle", "MoCA": "Montreal Cognitive Assessment", "UPDRS": "Unified Parkinson's Disease Rating Scale",
+    "YOE": "Years of Education", "delayedfb": "Delayed Feedback", "audiodelay": "Audio delay", "tgt_jump": "Target jump",
+    "tgt_jump_size": "Target jump size", "tgt_error": "Target error", "Hand_raw": "Raw hand angle",
+    "Hand_dt": "Hand displacement time", "Hand_Diff": "Hand difference", "Exp": "Experiment",
+    "RT_dt": "Reaction time difference", "Hand_IB": "Hand inter-block", "HRbase": "Hand Report base",
+    "FC_TT": "Feedback Control Task Time", "FC_X": "Feedback Control X-coordinate", "FC_Y": "Feedback Control Y-coordinate",
+    "StartTime": "Start time", "education": "Education", "technical": "Technical rating",
+    "rating": "Enjoyment", "browsertype": "Browser type", "mousetype": "Mouse type", "racialorigin": "Racial origin",
+    "repeat": "Number of times participated", "sex": "Sex", "futureemails": "Future emails",
+    "NeuroDisease": "Neuro Disease", "NeuroDiseaseDescribe": "Description of disease", "screenheight": "Screen height",
+    "screenwidth": "Screen width", "clumsy": "Clumsiness rating", "seedisplay": "Clarity of display",
+    "videogames": "Video game experience", "major": "Major", "Sleep": "Daily sleep hours",
+    "ComputerUsage": "Computer usage", "gameIndex": "Game index"
+}
+
+# Template headers
+template_headers = [
+    "id", "repeat_number", "researcher_id*", "condition*", "block_number", "trial_number",
+    "research_setting*", "hand_or_mouse*", "subject_age", "subject_sex", "subject_race",
+    "neuro_condition*", "neuro_description", "years_of_education", "subject_vision",
+    "dominant_hand", "screen_height", "screen_width", "device_type", "mouse_type",
+    "reaction_time*", "movement_time*", "search_time", "feedback_type*", "feedback_time*",
+    "initial_x", "initial_y", "number_of_targets*", "target_type*", "target_angle",
+    "target_height", "target_width", "target_x", "target_y", "rotation_angle", "clamp_size",
+    "rotation_direction", "hand_angle*", "hand_flip", "hand_base", "hand_max_velocity",
+    "cognitive_assessment", "cognitive_assessment_score"
+]
+
+# Mapping compiled once per process; resolved headers are remembered across all files of a batch
+header_resolver = compile_mapping(abbreviation_mapping, protected_headers=template_headers)
+
+# Number of processes used by the command line tool
+num_workers = 1
+
+# Format of the standardized files written by the command line tool
+default_format = "csv"
+
+# Function to populate the template with data from the input DataFrame
+def populate_template(input_df, template_headers):
+    # Work out where every input column goes before copying anything:
+    # "Subject ID" becomes "id", template columns keep their name, others get an asterisk
+    plan = {}  # output column -> position of the input column (a later column with the same name wins)
+    known_columns = set(template_headers)
+    for position, col in enumerate(input_df.columns):
+        if col == "Subject ID":  # Map "Subject ID" to "id" in the template
+            target = "id"
+        elif col in known_columns:
+            target = col
+        else:
+            # If column is not in the template, add it with an asterisk
+            target = col + "*"
+        plan[target] = position
+        known_columns.add(target)
+
+    # Build the populated template in one go: template columns first, then the added ones
+    template_df = input_df.iloc[:, list(plan.values())]
+    template_df.columns = list(plan.keys())
+    template_df = template_df.reindex(columns=list(template_headers) + [col for col in plan if col not in template_headers])
+
+    # Missing values stay missing: schema columns (also the empty ones) get their nullable dtype, text becomes categorical
+    apply_schema(template_df)
+    infer_nullable_dtypes(template_df)
+    return template_df
+
+# Function to standardize the columns of one DataFrame
+def standardize_dataframe(df):
+    # Update column headers based on the abbreviation mapping (case, spacing and separators don't matter)
+    df.columns, conflicts = resolve_columns(header_resolver, list(df.columns))
+
+    # Populate the template based on the standardized headers
+    return populate_template(df, template_headers), conflicts
+
+# Function to standardize one CSV file and save it in the output folder in the given format
+# (missing values are written as missing_marker in csv and xlsx files when one is given)
+def standardize_file(file_path, output_dir, output_format=default_format, missing_marker=None):
+    summary = {"input": file_path, "output": "", "rows": 0, "columns": 0, "unmapped_columns": "",
+               "header_conflicts": "", "error": ""}
+    try:
+        # Columns already named as in the schema get their compact dtype
+        df, _ = read_data_csv(file_path)
+        populated_template, conflicts = standardize_dataframe(df)
+
+        # Text formats get float32 values through their shortest decimal text (0.654, not 0.6539999842643738)
+        exported = widen_floats(populated_template) if is_text_format(output_format) else populated_template
+        output_path = write_output(exported, os.path.join(
+            output_dir, os.path.splitext(os.path.basename(file_path))[0] + "_standardized"), output_format, missing_marker)
+
+        summary["output"] = output_path
+        summary["rows"] = len(populated_template)
+        summary["columns"] = len(populated_template.columns)
+        summary["unmapped_columns"] = " ".join(col for col in populated_template.columns
+                                               if col.endswith("*") and col not in template_headers)
+        summary["header_conflicts"] = "; ".join(header_resolver["conflicts"] + conflicts)
+    except Exception as e:
+        summary["error"] = str(e)
+    return summary
+
+# Function to standardize many CSV files, across a process pool when workers > 1
+def standardize_files(file_paths, output_dir, workers=1, output_format=default_format, missing_marker=None):
+    os.makedirs(output_dir, exist_ok=True)
+    output_dirs = [output_dir] * len(file_paths)
+    formats = [output_format] * len(file_paths)
+    markers = [missing_marker] * len(file_paths)
+    if workers <= 1 or len(file_paths) <= 1:
+        return list(map(standardize_file, file_paths, output_dirs, formats, markers))
+    with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as executor:
+        return list(executor.map(standardize_file, file_paths, output_dirs, formats, markers))
+
+# Function to write the per-file summary as a CSV file
+def write_summary(summaries, summary_path):
+    with open(summary_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["input", "output", "rows", "columns", "unmapped_columns",
+                                                  "header_conflicts", "error"])
+        writer.writeheader()
+        writer.writerows(summaries)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Standardize the headers of legacy motor learning CSV files.")
+    parser.add_argument("inputs", nargs="+", help='CSV files or glob patterns, e.g. "legacy/*.csv"')
+    parser.add_argument("--output-dir", required=True, help="folder for the standardized files and the summary")
+    parser.add_argument("--workers", type=int, default=num_workers, help="number of files processed in parallel")
+    parser.add_argument("--format", choices=list(output_formats), default=default_format,
+                        help="format of the standardized files (xlsx only for small files under review)")
+    parser.add_argument("--missing-marker", metavar="TEXT",
+                        help='write missing values as TEXT (e.g. "None Provided") in csv and xlsx files instead of empty cells')
+    args = parser.parse_args(argv)
+    if args.missing_marker is not None and not is_text_format(args.format):
+        parser.error(f"--missing-marker only applies to csv and xlsx; {args.format} files store missing values as nulls")
+
+    file_paths = sorted({path for pattern in args.inputs for path in (glob.glob(pattern) or [pattern])})
+    summaries = standardize_files(file_paths, args.output_dir, args.workers, args.format, args.missing_marker)
+    write_summary(summaries, os.path.join(args.output_dir, "standardize_summary.csv"))
+
+    failed = [summary for summary in summaries if summary["error"]]
+    for summary in failed:
+        print(f"FAILED: {summary['input']} ({summary['error']})")
+    for summary in summaries:
+        if summary["header_conflicts"]:
+            print(f"CHECK HEADERS: {summary['input']} ({summary['header_conflicts']})")
+    print(f"Standardized {len(summaries) - len(failed)} of {len(summaries)} files into {args.output_dir}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+--------------------------------------------------------------------------
+ Header resolution for the CSV header standardizer
+
+ Compiles an abbreviation mapping into an index of normalized headers
+ (case, surrounding whitespace and separators such as ' ', '_', '-', '.'
+ folded), so 'hand_Theta', 'Hand theta' and 'RT ' find the entries for
+ 'hand_theta' and 'RT'. Headers that still don't match fall back to the
+ closest entry by similarity, unless that match is ambiguous or the two
+ differ in a number or a word ('hand_theta_51' is not 'hand_theta_50',
+ 'Sleep2' is not 'Sleep').
+
+ Every resolution is remembered, so a header seen in one file of a batch is
+ resolved from a dictionary lookup in every following file.
+
+ Usage:
+    resolver = compile_mapping(abbreviation_mapping, protected_headers=template_headers)
+    new_columns, conflicts = resolve_columns(resolver, df.columns)
+
+--------------------------------------------------------------------------
+"""
+
+import difflib
+import re
+
+
+# Similarity (0 to 1) a header needs to be matched to an entry it doesn't spell exactly
+fuzzy_cutoff = 0.85
+
+# Two fuzzy candidates closer than this with different meanings are ambiguous
+fuzzy_ambiguity_margin = 0.05
+
+# Shorter normalized headers are never fuzzy matched (too many false hits among abbreviations)
+fuzzy_min_length = 4
+
+
+def normalize_header(header):
+    """ Header folded to lower case, with runs of whitespace and separators turned into one '_' """
+    return re.sub(r'[\s_\-\.]+', '_', str(header).strip().lower()).strip('_')
+
+
+def compile_mapping(mapping, protected_headers=()):
+    """
+    Precompile a header mapping into a resolver (a dict holding the normalized index and the memo).
+    protected_headers are already standardized names; they are never matched fuzzily.
+    Entries whose headers fold together but mean different things are listed in resolver['conflicts'].
+    """
+    index = {}
+    conflicts = []
+    for header, target in mapping.items():
+        key = normalize_header(header)
+        if key in index and index[key][1] != target:
+            conflicts.append(f'"{index[key][0]}" and "{header}" both read as "{key}" but map to '
+                             f'"{index[key][1]}" and "{target}"; keeping "{index[key][1]}"')
+            continue
+        index.setdefault(key, (header, target))
+
+    protected = {normalize_header(header.rstrip('*')) for header in protected_headers}
+    protected |= {normalize_header(target) for target in mapping.values()}
+
+    return {
+        'mapping': dict(mapping),
+        'index': index,
+        'protected': protected,
+        'conflicts': conflicts,
+        'memo': {},
+        'notes': {},
+    }
+
+
+def header_tokens(key):
+    """ Letters and runs of digits of a normalized header: ('handtheta', ['50']) for 'hand_theta_50' """
+    return ''.join(re.findall(r'[a-z]+', key)), re.findall(r'\d+', key)
+
+
+def match_fuzzy(resolver, key):
+    """ Target of the closest index entry to a normalized header, or None if no entry is close enough or it's ambiguous """
+    scored = []
+    for candidate in difflib.get_close_matches(key, resolver['index'].keys(), n=3, cutoff=fuzzy_cutoff):
+        # Similar spelling is not enough: a different number or word is a different measure
+        if header_tokens(candidate) != header_tokens(key):
+            continue
+        scored.append((difflib.SequenceMatcher(None, key, candidate).ratio(), candidate))
+    if not scored:
+        return None, None
+
+    scored.sort(reverse=True)
+    best_score, best = scored[0]
+    for score, candidate in scored[1:]:
+        if best_score - score < fuzzy_ambiguity_margin and resolver['index'][candidate][1] != resolver['index'][best][1]:
+            return None, f'"{key}" is as close to "{resolver["index"][best][0]}" as to "{resolver["index"][candidate][0]}"; left unmapped'
+    return resolver['index'][best][1], None
+
+
+def resolve_header(resolver, header):
+    """
+    Standardized name of one header and how it was found: 'exact', 'normalized', 'fuzzy',
+    or 'unmapped' (the header is returned unchanged). Results are memoized in the resolver.
+    """
+    if header in resolver['memo']:
+        return resolver['memo'][header]
+
+    key = normalize_header(header)
+    note = None
+    if header in resolver['mapping']:
+        result = (resolver['mapping'][header], 'exact')
+    elif key in resolver['index']:
+        result = (resolver['index'][key][1], 'normalized')
+    elif key in resolver['protected'] or len(key) < fuzzy_min_length:
+        result = (header, 'unmapped')
+    else:
+        target, note = match_fuzzy(resolver, key)
+        result = (target, 'fuzzy') if target else (header, 'unmapped')
+
+    if note:
+        resolver['notes'][header] = note
+    resolver['memo'][header] = result
+    return result
+
+
+def resolve_columns(resolver, columns):
+    """ Standardized names of a list of columns, and the conflicts found among them """
+    resolved = [resolve_header(resolver, col) for col in columns]
+
+    # A column spelled like an entry keeps its target; a similar-looking column can't take it over
+    conflicts = []
+    claimed = {target for target, how in resolved if how in ('exact', 'normalized')}
+    for position, (col, (target, how)) in enumerate(zip(columns, resolved)):
+        if how == 'fuzzy' and target in claimed:
+            resolved[position] = (col, 'unmapped')
+            conflicts.append(f'"{col}" is similar to "{target}", which another column already maps to; left unmapped')
+    new_columns = [target for target, _ in resolved]
+
+    sources = {}
+    for col, target in zip(columns, new_columns):
+        if target in sources:
+            conflicts.append(f'"{sources[target]}" and "{col}" both map to "{target}"; keeping "{col}"')
+        sources[target] = col
+    for col, (target, how) in zip(columns, resolved):
+        if how == 'fuzzy':
+            conflicts.append(f'"{col}" was matched to "{target}" by similarity; please check')
+        if col in resolver['notes']:
+            conflicts.append(resolver['notes'][col])
+    return new_columns, conflicts
@@ -0,0 +1,84 @@
+"""
+--------------------------------------------------------------------------
+ Output formats for standardized datasets
+
+    csv      streamed to disk in chunks of rows (the default)
+    parquet  columnar, compressed, keeps dtypes (needs pyarrow)
+    feather  columnar, fastest to read back (needs pyarrow)
+    xlsx     for human review of small datasets; written row by row in
+             openpyxl's write-only mode, so memory stays constant
+
+ Missing values are written as empty cells in the text formats (csv, xlsx)
+ and as nulls in the columnar formats. Text formats can show them as a
+ marker such as "None Provided" instead, when one is asked for.
+
+ Usage:
+    path = write_output(df, "out/data_standardized", "parquet")
+    path = write_output(df, "out/data_standardized", "xlsx", missing_marker="None Provided")
+
+--------------------------------------------------------------------------
+"""
+
+# Rows written per chunk by the CSV writer
+csv_chunk_rows = 100_000
+
+# Largest number of data rows an .xlsx sheet can hold (plus one header row)
+xlsx_max_rows = 1_048_575
+
+
+def write_csv(df, path, missing_marker=None):
+    """ Write a dataframe as CSV, a chunk of rows at a time """
+    df.to_csv(path, index=False, chunksize=csv_chunk_rows, na_rep=missing_marker or "")
+
+
+def write_parquet(df, path, missing_marker=None):
+    """ Write a dataframe as a Parquet file """
+    df.to_parquet(path, index=False)
+
+
+def write_feather(df, path, missing_marker=None):
+    """ Write a dataframe as a Feather file """
+    df.reset_index(drop=True).to_feather(path)
+
+
+def write_xlsx(df, path, missing_marker=None):
+    """ Write a dataframe as an Excel sheet in constant memory (small datasets only) """
+    if len(df) > xlsx_max_rows:
+        raise ValueError(f"{len(df)} rows don't fit in an Excel sheet (at most {xlsx_max_rows}); "
+                         "please save as csv, parquet or feather instead")
+
+    import pandas as pd
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(col) for col in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        # Missing values (NaN, NA) become empty cells or the marker
+        sheet.append([missing_marker if pd.isna(value) else value for value in row])
+    workbook.save(path)
+
+
+# Writer and whether the format is text (can show missing values as a marker), by format name (also the file extension)
+output_formats = {
+    "csv": (write_csv, True),
+    "parquet": (write_parquet, False),
+    "feather": (write_feather, False),
+    "xlsx": (write_xlsx, True),
+}
+
+
+def is_text_format(output_format):
+    """ True if a format writes values as text (and can show missing values as a marker) """
+    return output_formats[output_format][1]
+
+
+def write_output(df, path_without_extension, output_format, missing_marker=None):
+    """ Write a dataframe in the given format and return the path of the file """
+    if output_format not in output_formats:
+        raise ValueError(f"Unknown output format {output_format!r}; choose one of {', '.join(output_formats)}")
+    if missing_marker is not None and not is_text_format(output_format):
+        raise ValueError(f"{output_format} files store missing values as nulls; a missing value marker only applies to csv and xlsx")
+    path = f"{path_without_extension}.{output_format}"
+    output_formats[output_format][0](df, path, missing_marker)
+    return path
@@ -0,0 +1,151 @@
+"""
+--------------------------------------------------------------------------
+ Registry of submitted projects
+
+ One SQLite file (projects.db) holds a row for every project submitted with
+ additional_information.py, indexed on DOI, hashed email and project type,
+ so checks such as "has this DOI already been submitted" are index lookups.
+ Every submission is a single short transaction; several people can submit
+ at the same time and each one waits its turn for the write lock.
+
+ Usage:
+    from project_registry import add_project, find_projects
+    add_project("projects.db", {"project_type": "preprint", "title": "...", "doi": "10.1101/..."})
+    find_projects("projects.db", doi="10.1101/...")
+
+    python project_registry.py --import-csv projects.csv   # move an old projects.csv into the registry
+
+--------------------------------------------------------------------------
+"""
+
+import argparse
+import csv
+import hashlib
+import sqlite3
+import sys
+import time
+
+# Registry file, in the working directory like projects.csv was
+registry_path = "projects.db"
+
+# Registry columns and the headers they had in projects.csv
+registry_columns = {
+    "project_type": "Project Type",
+    "title": "Title",
+    "authors": "Authors",
+    "citation": "Citation",
+    "doi": "DOI",
+    "date": "Date",
+    "journal": "Journal",
+    "country": "Country",
+    "description": "Description",
+    "additional_comments": "Additional Comments",
+    "hashed_email": "Hashed Email",
+}
+
+# Seconds a submitter waits for another one to finish writing
+lock_timeout_seconds = 30
+
+# Function to hash email addresses for anonymization
+def hash_email(email):
+    return hashlib.sha256(email.encode()).hexdigest()
+
+# Function to open the registry, creating the table and indexes if needed
+def connect(path=registry_path):
+    connection = sqlite3.connect(path, timeout=lock_timeout_seconds)
+    connection.execute("PRAGMA journal_mode=WAL")
+    column_definitions = ", ".join(f"{column} TEXT" for column in registry_columns)
+    connection.execute(f"CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                       f"{column_definitions}, submitted_at REAL)")
+    # DOIs are compared without regard to case (10.1101/ABC and 10.1101/abc are the same DOI)
+    connection.execute("CREATE INDEX IF NOT EXISTS projects_doi ON projects (doi COLLATE NOCASE)")
+    connection.execute("CREATE INDEX IF NOT EXISTS projects_hashed_email ON projects (hashed_email)")
+    connection.execute("CREATE INDEX IF NOT EXISTS projects_project_type ON projects (project_type)")
+    return connection
+
+# Function to add one project and return its id
+def add_project(path, project):
+    unknown = set(project) - set(registry_columns)
+    if unknown:
+        raise ValueError(f"ERROR. Unknown project fields: {', '.join(sorted(unknown))}")
+
+    values = [project.get(column, "") for column in registry_columns]
+    connection = connect(path)
+    try:
+        with connection:
+            cursor = connection.execute(
+                f"INSERT INTO projects ({', '.join(registry_columns)}, submitted_at) "
+                f"VALUES ({', '.join(['?'] * len(registry_columns))}, ?)", values + [time.time()])
+        return cursor.lastrowid
+    finally:
+        connection.close()
+
+# Function to find projects by DOI, email (hashed here) and/or project type
+def find_projects(path, doi=None, email=None, project_type=None):
+    conditions = []
+    params = []
+    if doi:
+        conditions.append("doi = ? COLLATE NOCASE")
+        params.append(doi.strip())
+    if email:
+        conditions.append("hashed_email = ?")
+        params.append(hash_email(email))
+    if project_type:
+        conditions.append("project_type = ?")
+        params.append(project_type)
+
+    statement = "SELECT * FROM projects"
+    if conditions:
+        statement += " WHERE " + " AND ".join(conditions)
+    statement += " ORDER BY id"
+
+    connection = connect(path)
+    connection.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in connection.execute(statement, params)]
+    finally:
+        connection.close()
+
+# Function to tell whether a DOI has already been submitted
+def doi_submitted(path, doi):
+    connection = connect(path)
+    try:
+        return connection.execute("SELECT 1 FROM projects WHERE doi = ? COLLATE NOCASE LIMIT 1",
+                                  (doi.strip(),)).fetchone() is not None
+    finally:
+        connection.close()
+
+# Function to move the rows of an old projects.csv into the registry (in one transaction)
+def import_projects_csv(path, csv_path):
+    columns_by_header = {header: column for column, header in registry_columns.items()}
+    with open(csv_path, newline="") as file:
+        rows = [{columns_by_header[header]: value for header, value in row.items() if header in columns_by_header}
+                for row in csv.DictReader(file)]
+
+    connection = connect(path)
+    try:
+        with connection:
+            connection.executemany(
+                f"INSERT INTO projects ({', '.join(registry_columns)}, submitted_at) "
+                f"VALUES ({', '.join(['?'] * len(registry_columns))}, NULL)",
+                [[row.get(column, "") for column in registry_columns] for row in rows])
+    finally:
+        connection.close()
+    return len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registry of projects submitted to the Motor Learning Database.")
+    parser.add_argument("--registry", default=registry_path, help="path of the registry (default: projects.db)")
+    parser.add_argument("--import-csv", metavar="PATH", help="add the rows of an old projects.csv to the registry")
+    parser.add_argument("--doi", help="list the projects submitted with this DOI")
+    args = parser.parse_args(argv)
+
+    if args.import_csv:
+        print(f"Imported {import_projects_csv(args.registry, args.import_csv)} projects into {args.registry}")
+    if args.doi:
+        for project in find_projects(args.registry, doi=args.doi):
+            print(f"{project['id']}: {project['title']} ({project['project_type']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())